@@ -0,0 +1,197 @@
+"""Statistics of the sensitivity analysis (Sobol indices and OFAT summaries) with vectorized bootstrap resampling."""
+
+# Imports
+import multiprocessing as mp
+import numpy as np
+import pandas as pd
+import scipy.stats
+
+# Maximum number of array elements per bootstrap chunk (limits the memory use)
+chunk_elements = 2 * 10**7
+
+
+def split_saltelli(Y, D):
+    """
+    Separate the outputs of a Saltelli design (without second order) into the matrices A, B and AB.
+
+    Parameters
+    ----------
+    Y : numpy.ndarray (N * (D + 2) x K)
+        outputs of the model for K output parameters, in the order of the design
+    D : int
+        number of variables
+
+    Returns
+    -------
+    A : numpy.ndarray (N x K)
+    AB : numpy.ndarray (N x D x K)
+    B : numpy.ndarray (N x K)
+    """
+    Y = np.asarray(Y, dtype=float)
+    Y = Y.reshape(len(Y), -1)
+    if len(Y) % (D + 2) != 0:
+        raise RuntimeError('Incorrect number of samples in model output (expected a multiple of %s)' %(D + 2))
+
+    # Normalize every output (same as SALib)
+    Y = (Y - Y.mean(axis=0)) / Y.std(axis=0)
+    Y = Y.reshape(-1, D + 2, Y.shape[1])
+
+    return Y[:, 0], Y[:, 1:-1], Y[:, -1]
+
+
+def sobol_estimates(A, AB, B):
+    """
+    First and total order Sobol indices (Saltelli et al. 2010) for all variables and outputs at once.
+
+    Parameters
+    ----------
+    A : numpy.ndarray (... x N x K)
+    AB : numpy.ndarray (... x N x D x K)
+    B : numpy.ndarray (... x N x K)
+        leading dimensions (e.g. bootstrap resamples) are kept
+
+    Returns
+    -------
+    S1 : numpy.ndarray (... x D x K)
+        first order indices
+    ST : numpy.ndarray (... x D x K)
+        total order indices
+    """
+    var = np.var(np.concatenate((A, B), axis=-2), axis=-2)[..., None, :]
+    var = np.where(var > np.finfo(float).eps, var, np.inf)
+
+    S1 = np.mean(B[..., None, :] * (AB - A[..., None, :]), axis=-3) / var
+    ST = 0.5 * np.mean((A[..., None, :] - AB)**2, axis=-3) / var
+
+    return S1, ST
+
+
+def sobol_resamples(A, AB, B, r):
+    """
+    Sobol indices of bootstrap resamples.
+
+    Parameters
+    ----------
+    A, AB, B : numpy.ndarray
+        see split_saltelli
+    r : numpy.ndarray (R x N)
+        indices of the resamples
+
+    Returns
+    -------
+    S1 : numpy.ndarray (R x D x K)
+    ST : numpy.ndarray (R x D x K)
+    """
+    return sobol_estimates(A[r], AB[r], B[r])
+
+
+def sobol_analyze(Y, D, names=None, num_resamples=100, conf_level=0.95, processes=1, seed=None):
+    """
+    First and total order Sobol indices with bootstrap confidence intervals for several outputs.
+
+    Gives the same indices as SALib.analyze.sobol.analyze (calc_second_order=False),
+    but all variables, outputs and resamples are computed as array operations.
+
+    Parameters
+    ----------
+    Y : numpy.ndarray (N * (D + 2) x K)
+        outputs of the model in the order of the Saltelli design
+    D : int
+        number of variables
+    names : list
+        names of the K outputs, default is None (0, 1, ...)
+    num_resamples : int
+        number of bootstrap resamples, default is 100
+    conf_level : float
+        confidence level, default is 0.95
+    processes : int
+        number of processes over which the resamples are divided, default is 1
+    seed : int
+        seed of the resampling, default is None
+
+    Returns
+    -------
+    Si : dict
+        S1, S1_conf, ST and ST_conf (arrays of length D) for every output
+    """
+    A, AB, B = split_saltelli(Y, D)
+    N, K = A.shape
+
+    S1, ST = sobol_estimates(A, AB, B)
+
+    # Bootstrap resamples in chunks that fit in memory
+    r = np.random.default_rng(seed).integers(N, size=(num_resamples, N))
+    chunk = max(1, chunk_elements // (N * (D + 2) * K))
+    chunks = [(A, AB, B, r[i:i + chunk]) for i in range(0, num_resamples, chunk)]
+
+    if processes > 1 and len(chunks) > 1:
+        with mp.Pool(processes) as pool:
+            resamples = pool.starmap(sobol_resamples, chunks)
+    else:
+        resamples = [sobol_resamples(*args) for args in chunks]
+
+    S1_resamples = np.concatenate([s[0] for s in resamples])
+    ST_resamples = np.concatenate([s[1] for s in resamples])
+
+    Z = scipy.stats.norm.ppf(0.5 + conf_level / 2)
+    S1_conf = Z * S1_resamples.std(axis=0, ddof=1)
+    ST_conf = Z * ST_resamples.std(axis=0, ddof=1)
+
+    names = range(K) if names is None else names
+
+    return {name: {'S1': S1[:, k], 'S1_conf': S1_conf[:, k], 'ST': ST[:, k], 'ST_conf': ST_conf[:, k]}
+            for k, name in enumerate(names)}
+
+
+def ofat_summary(results, outputs, num_resamples=1000, conf_level=0.95, seed=None):
+    """
+    Mean, std and bootstrap confidence interval of the mean for every (variable, value) and output at once.
+
+    Parameters
+    ----------
+    results : pandas.DataFrame
+        results in the long format with columns variable, value, replicate and the outputs (see store.ofat_records)
+    outputs : list
+        names of the output parameters
+    num_resamples : int
+        number of bootstrap resamples, default is 1000
+    conf_level : float
+        confidence level, default is 0.95
+    seed : int
+        seed of the resampling, default is None
+
+    Returns
+    -------
+    summary : pandas.DataFrame
+        one row per (variable, value) with the number of replicates (n) and
+        the columns <output>_mean, <output>_std, <output>_low and <output>_high
+    """
+    groups = results.groupby(['variable', 'value'], sort=False).ngroup().values
+    n_groups = np.max(groups) + 1
+    replicates = results.groupby(groups).cumcount().values
+
+    # Outcomes as an array (groups x replicates x outputs), padded with NaN
+    counts = np.bincount(groups, minlength=n_groups)
+    data = np.full((n_groups, np.max(counts), len(outputs)), np.nan)
+    data[groups, replicates] = results[outputs].values.astype(float)
+
+    # Resample within every group (only from the available replicates)
+    rng = np.random.default_rng(seed)
+    u = rng.uniform(size=(num_resamples, n_groups, data.shape[1]))
+    r = (u * counts[None, :, None]).astype(int)
+    mask = np.arange(data.shape[1])[None, None, :] < counts[None, :, None]
+    resamples = np.where(mask[..., None], data[np.arange(n_groups)[None, :, None], r], np.nan)
+    means = np.nanmean(resamples, axis=2)
+
+    alpha = (1 - conf_level) / 2
+    low, high = np.quantile(means, [alpha, 1 - alpha], axis=0)
+
+    first = results.groupby(groups).head(1)
+    summary = pd.DataFrame({'variable': first['variable'].values, 'value': first['value'].values, 'n': counts})
+    for k, output in enumerate(outputs):
+        summary[output + '_mean'] = np.nanmean(data[:, :, k], axis=1)
+        summary[output + '_std'] = np.nanstd(data[:, :, k], axis=1, ddof=1)
+        summary[output + '_low'] = low[:, k]
+        summary[output + '_high'] = high[:, k]
+
+    return summary
@@ -0,0 +1,244 @@
+"""Module containing an on-disk cache of the output of model runs."""
+
+# Imports
+import functools
+import hashlib
+import json
+import os
+
+import numpy as np
+
+# Source files that determine the outcome of a run (sweep.get_output determines the outputs that are stored)
+source_files = ['model.py', 'user.py', 'utils.py', 'histogram.py', 'population.py', 'meanfield.py', 'sweep.py']
+
+
+@functools.lru_cache(maxsize=None)
+def code_version():
+    """
+    Determine the version of the model code.
+
+    Returns
+    -------
+    version : str
+        hash of the source files of the model
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    h = hashlib.sha256()
+    for filename in source_files:
+        with open(os.path.join(directory, filename), 'rb') as f:
+            h.update(f.read())
+
+    return h.hexdigest()
+
+
+def canonical(value):
+    """
+    Convert a value to a form that is the same for equal settings (numpy types become python types).
+
+    Parameters
+    ----------
+    value : object
+        number, list or dict (possibly with numpy types)
+
+    Returns
+    -------
+    value : object
+        value that can be written to json
+    """
+    if isinstance(value, dict):
+        return {str(k): canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [canonical(v) for v in value]
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        value = float(value)
+        # Integer valued floats (e.g. 12.0) give the same key as integers
+        return int(value) if value.is_integer() else value
+
+    return value
+
+
+def run_key(stackoverflow, t, seed, tol=None, every=5, window=3):
+    """
+    Determine the key of a run.
+
+    Parameters
+    ----------
+    stackoverflow : model.network or meanfield.meanfield
+        model with the parameter setting of the run
+    t : int
+        number of timesteps
+    seed : int
+        seed of the random number generator
+    tol : float
+        tolerance of the early stopping of the run, default is None (no early stopping)
+    every : int
+        number of timesteps between two convergence checks, default is 5
+    window : int
+        number of checks over which the coefficients have to be stable, default is 3
+
+    Returns
+    -------
+    key : str
+        hash of the model type, parameters, number of timesteps, seed, stopping rule and code version
+    """
+    setting = {'engine': type(stackoverflow).__name__,
+               'n': stackoverflow.new_users,
+               'treshold': stackoverflow.upvote_treshold,
+               'bias': stackoverflow.upvote_bias,
+               'distr': stackoverflow.distr,
+               'tag_cdf': np.round(stackoverflow.tag_cdf, 12),
+               't': t,
+               'seed': seed,
+               'version': code_version()}
+    if setting['engine'] == 'meanfield':
+        # Resolution of the approximation
+        setting['n_nodes'] = stackoverflow.n_nodes
+        setting['quantile_seed'] = stackoverflow.seed
+    if tol is not None:
+        # Runs that can stop early (the keys of full runs are unchanged)
+        setting['stop'] = [tol, every, window]
+
+    text = json.dumps(canonical(setting), sort_keys=True)
+
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class run_cache:
+    """
+    On-disk cache of the output of model runs with a maximum size (least recently used entries are removed).
+
+    Attributes
+    ----------
+    directory : str
+        directory in which the entries are stored (one json file per run)
+    max_size : int
+        maximum total size of the entries in bytes
+    size : int
+        (estimated) total size of the entries in bytes
+    hits : int
+        number of times an entry was found
+    misses : int
+        number of times an entry was not found
+
+    Methods
+    -------
+    get(key)
+        Get the output of a run.
+    put(key, output)
+        Store the output of a run.
+    entries()
+        Get all the entries of the cache.
+    evict()
+        Remove the least recently used entries until the cache fits within the maximum size.
+    """
+
+    def __init__(self, directory='run_cache', max_size=10**8):
+        """
+        Initialize a cache.
+
+        Parameters
+        ----------
+        directory : str
+            directory in which the entries are stored, default is run_cache
+        max_size : int
+            maximum total size of the entries in bytes, default is 100 MB
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self.size = sum([size for _, size, _ in self.entries()])
+
+    def get(self, key):
+        """
+        Get the output of a run.
+
+        Parameters
+        ----------
+        key : str
+            key of the run (see run_key)
+
+        Returns
+        -------
+        output : dict
+            output of the run, None if the run is not in the cache
+        """
+        path = os.path.join(self.directory, key + '.json')
+        try:
+            with open(path) as f:
+                output = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        # Mark the entry as recently used
+        os.utime(path)
+        self.hits += 1
+
+        return output
+
+    def put(self, key, output):
+        """
+        Store the output of a run.
+
+        Parameters
+        ----------
+        key : str
+            key of the run (see run_key)
+        output : dict
+            output of the run
+        """
+        path = os.path.join(self.directory, key + '.json')
+
+        # Write to a temporary file first, so other processes never read a partial entry
+        tmp = '%s.%d.tmp' %(path, os.getpid())
+        with open(tmp, 'w') as f:
+            json.dump(canonical(output), f)
+        self.size += os.path.getsize(tmp)
+        try:
+            # An existing entry (e.g. written by another process) is overwritten
+            self.size -= os.path.getsize(path)
+        except FileNotFoundError:
+            pass
+        os.replace(tmp, path)
+
+        if self.size > self.max_size:
+            self.evict()
+
+    def entries(self):
+        """
+        Get all the entries of the cache.
+
+        Returns
+        -------
+        entries : list
+            (last use, size, path) of every entry
+        """
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.json'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        return entries
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits within the maximum size."""
+        entries = self.entries()
+
+        # The directory can be shared by several processes, so the size is determined again
+        self.size = sum([size for _, size, _ in entries])
+        for _, size, path in sorted(entries):
+            if self.size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self.size -= size
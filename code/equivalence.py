@@ -0,0 +1,235 @@
+"""Statistical comparison of the output distribution of two implementations of the model (over many seeds)."""
+
+# Imports
+import functools
+import multiprocessing as mp
+
+import numpy as np
+import pandas as pd
+import scipy.stats
+
+from model import network
+from sweep import get_output, outputs
+
+# Distributions that are compared per run (binsize as in sweep.get_output)
+distributions = {'upvote_distr': ('get_upvote_distr', 5), 'reputation_distr': ('get_reputation_distr', 125)}
+
+
+def run_seed(factory, t, seed):
+    """
+    Run a single seeded replicate and collect the outputs and distributions.
+
+    Parameters
+    ----------
+    factory : callable
+        creates the model (e.g. functools.partial(model.network, 150, 'tags.txt'))
+    t : int
+        number of timesteps
+    seed : int
+        seed of the random number generator
+
+    Returns
+    -------
+    result : dict
+        value of every output parameter and, for every distribution, the probability per bin (dict)
+    """
+    np.random.seed(seed)
+    stackoverflow = factory()
+    stackoverflow.run(t)
+
+    result = get_output(stackoverflow)
+    for name, (method, binsize) in distributions.items():
+        pdf, bins = getattr(stackoverflow, method)(binsize)
+        result[name] = {float(b): float(p) for b, p in zip(bins, pdf)}
+
+    return result
+
+
+def collect(factory, t, seeds, processes=None):
+    """
+    Run the model for many seeds (in parallel).
+
+    Parameters
+    ----------
+    factory : callable
+        creates the model, has to be picklable (a class or functools.partial)
+    t : int
+        number of timesteps
+    seeds : list
+        seeds of the replicates
+    processes : int
+        number of processes, default is None (number of cpus)
+
+    Returns
+    -------
+    results : list
+        outcome of every replicate (see run_seed)
+    """
+    with mp.Pool(processes) as pool:
+        return pool.map(functools.partial(run_seed, factory, t), seeds)
+
+
+def pdf_matrix(distrs):
+    """
+    Put the distributions of several runs on a common set of bins.
+
+    Parameters
+    ----------
+    distrs : list
+        probability per bin (dict) of every run
+
+    Returns
+    -------
+    P : numpy.ndarray (runs x bins)
+        probability of every bin (zero if the run has no mass in a bin)
+    """
+    bins = sorted(set().union(*distrs))
+    index = {b: i for i, b in enumerate(bins)}
+
+    P = np.zeros((len(distrs), len(bins)))
+    for row, distr in enumerate(distrs):
+        for b, p in distr.items():
+            P[row, index[b]] = p
+
+    return P
+
+
+def permutation_test(P, Q, n_permutations=999, seed=0):
+    """
+    Permutation test for a difference between the mean distribution of two groups of runs.
+
+    Parameters
+    ----------
+    P : numpy.ndarray (runs x bins)
+        distributions of the first group
+    Q : numpy.ndarray (runs x bins)
+        distributions of the second group (same bins)
+    n_permutations : int
+        number of random relabelings of the runs, default is 999
+    seed : int
+        seed of the permutations, default is 0
+
+    Returns
+    -------
+    statistic : float
+        L1 distance between the mean distributions
+    p_value : float
+        fraction of the relabelings with at least the same distance
+    """
+    data = np.vstack((P, Q))
+    statistic = np.sum(np.abs(P.mean(axis=0) - Q.mean(axis=0)))
+
+    # All relabelings at once: the first len(P) runs of every permutation form the first group
+    rng = np.random.default_rng(seed)
+    order = np.argsort(rng.random((n_permutations, len(data))), axis=1)
+    mask = np.zeros((n_permutations, len(data)))
+    np.put_along_axis(mask, order[:, :len(P)], 1, axis=1)
+    diff = mask @ data / len(P) - (1 - mask) @ data / len(Q)
+    distances = np.sum(np.abs(diff), axis=1)
+
+    p_value = (1 + np.sum(distances >= statistic - 1e-12)) / (1 + n_permutations)
+
+    return statistic, p_value
+
+
+def compare(reference, alternative, alpha=0.01, n_permutations=999):
+    """
+    Test for every output whether the two groups of runs come from the same distribution.
+
+    The scalar outputs are compared with a two-sample Kolmogorov-Smirnov test, the distributions
+    of upvotes and reputation with a permutation test. The significance level of a single test is
+    alpha divided by the number of tests (Bonferroni), so the probability that equivalent
+    implementations are rejected is at most alpha. An output with a non-finite value (e.g. NaN)
+    in either group is always reported as different.
+
+    Parameters
+    ----------
+    reference : list
+        outcome of every replicate of the reference implementation (see collect)
+    alternative : list
+        outcome of every replicate of the alternative implementation
+    alpha : float
+        false-alarm rate of the whole comparison, default is 0.01
+    n_permutations : int
+        number of relabelings of the permutation tests, default is 999
+
+    Returns
+    -------
+    comparison : pandas.DataFrame
+        for every output the test, statistic, p-value, mean of both groups and whether the
+        difference is significant
+    """
+    level = alpha / (len(outputs) + len(distributions))
+
+    rows = []
+    for name in outputs:
+        a = np.array([result[name] for result in reference], dtype=float)
+        b = np.array([result[name] for result in alternative], dtype=float)
+        if np.all(np.isfinite(a)) and np.all(np.isfinite(b)):
+            test = scipy.stats.ks_2samp(a, b)
+            statistic, p_value = test.statistic, test.pvalue
+        else:
+            statistic, p_value = np.nan, np.nan
+        rows.append({'output': name, 'test': 'ks', 'statistic': statistic, 'p_value': p_value,
+                     'reference': np.mean(a), 'alternative': np.mean(b)})
+
+    for name in distributions:
+        P = pdf_matrix([result[name] for result in reference + alternative])
+        if np.all(np.isfinite(P)):
+            statistic, p_value = permutation_test(P[:len(reference)], P[len(reference):], n_permutations)
+        else:
+            statistic, p_value = np.nan, np.nan
+        rows.append({'output': name, 'test': 'permutation', 'statistic': statistic, 'p_value': p_value,
+                     'reference': np.nan, 'alternative': np.nan})
+
+    # Non-finite outputs (p-value NaN) count as a difference
+    comparison = pd.DataFrame(rows)
+    comparison['different'] = ~(comparison['p_value'] >= level)
+
+    return comparison
+
+
+def equivalent(reference, alternative, t=20, runs=50, seed=0, alpha=0.01, processes=None):
+    """
+    Run two implementations of the model for many seeds and compare their output.
+
+    The implementations use different seeds (seed, ..., seed + runs - 1 and seed + runs, ...),
+    so the runs are independent even if the random numbers are drawn in the same order.
+
+    Parameters
+    ----------
+    reference : callable
+        creates the reference model (e.g. functools.partial(model.network, 150, 'tags.txt'))
+    alternative : callable
+        creates the alternative model
+    t : int
+        number of timesteps, default is 20
+    runs : int
+        number of replicates of every implementation, default is 50
+    seed : int
+        first seed, default is 0
+    alpha : float
+        false-alarm rate of the whole comparison, default is 0.01
+    processes : int
+        number of processes, default is None (number of cpus)
+
+    Returns
+    -------
+    same : bool
+        False if any of the outputs differs significantly
+    comparison : pandas.DataFrame
+        result of every test (see compare)
+    """
+    a = collect(reference, t, range(seed, seed + runs), processes)
+    b = collect(alternative, t, range(seed + runs, seed + 2 * runs), processes)
+    comparison = compare(a, b, alpha)
+
+    return not comparison['different'].any(), comparison
+
+
+if __name__ == '__main__':
+    # Compare the model with itself (no difference should be found) before adopting a new engine
+    factory = functools.partial(network, 150, 'tags.txt')
+    same, comparison = equivalent(factory, factory)
+    print(comparison.to_string())
+    print('equivalent' if same else 'different')
@@ -0,0 +1,146 @@
+"""Module to record the events of a simulation to a compact binary file."""
+
+# Imports
+import numpy as np
+
+# Layout of a single event (fixed size)
+event_dtype = np.dtype([('step', np.int32), ('kind', np.uint8), ('actor', np.int32),
+                        ('target', np.int32), ('tag', np.int16), ('value', np.float32)])
+
+# Types of events
+kinds = {'ask': 0, 'answer': 1, 'upvote_question': 2, 'upvote_answer': 3, 'reputation': 4, 'probability': 5}
+
+
+class recorder:
+    """
+    Appends the events of a simulation to a binary file.
+
+    Every event contains the timestep, the type of event, the user that caused the event (actor),
+    the target of the event, the tag and a value. The meaning of target and value depends on the type:
+
+    ask : target is the index of the question, value is 0
+    answer : target is the asker, value is the number of answers on the question
+    upvote_question / upvote_answer : target is the user that receives the upvote, value is 0
+    reputation : target is -1, value is the new reputation
+    probability : target is the index of the probability (network.probabilities), value is the new probability
+
+    Attributes
+    ----------
+    filename : str
+        file to which the events are written
+    buffer_size : int
+        number of events kept in memory before they are written to the file
+    buffer : list
+        events that are not yet written to the file
+    n_events : int
+        total number of recorded events
+
+    Methods
+    -------
+    record(step, kind, actor, target, tag, value)
+        Record an event.
+    flush()
+        Write the buffered events to the file.
+    """
+
+    def __init__(self, filename, buffer_size=2**16, append=False):
+        """
+        Initialize a recorder.
+
+        Parameters
+        ----------
+        filename : str
+            file to which the events are written
+        buffer_size : int
+            number of events kept in memory before they are written to the file, default is 65536
+        append : bool
+            if True, events are added to an existing file, default is False (file is overwritten)
+        """
+        self.filename = filename
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.n_events = 0
+
+        if not append:
+            open(filename, 'wb').close()
+
+    def record(self, step, kind, actor, target, tag, value):
+        """
+        Record an event.
+
+        Parameters
+        ----------
+        step : int
+            timestep of the event
+        kind : str
+            type of the event (key of kinds)
+        actor : int
+            id of the user that caused the event
+        target : int
+            target of the event
+        tag : int
+            tag of the event
+        value : float
+            value of the event
+        """
+        self.buffer.append((step, kinds[kind], actor, target, tag, value))
+        self.n_events += 1
+
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered events to the file."""
+        if self.buffer:
+            with open(self.filename, 'ab') as f:
+                np.array(self.buffer, dtype=event_dtype).tofile(f)
+            self.buffer = []
+
+
+def read_events(filename):
+    """
+    Read the events of a recorded simulation (memory-mapped).
+
+    Parameters
+    ----------
+    filename : str
+        file written by a recorder
+
+    Returns
+    -------
+    events : numpy.ndarray
+        structured array (event_dtype) with all events, the data is only read from disk when it is accessed
+    """
+    with open(filename, 'rb') as f:
+        if not f.read(1):
+            return np.zeros(0, dtype=event_dtype)
+
+    return np.memmap(filename, dtype=event_dtype, mode='r')
+
+
+def interactions(events, kind='upvote_answer'):
+    """
+    Count the interactions between users (e.g. who upvotes whom).
+
+    Parameters
+    ----------
+    events : numpy.ndarray
+        events of a simulation (see read_events)
+    kind : str
+        type of event, default is upvote_answer
+
+    Returns
+    -------
+    edges : numpy.ndarray
+        (actor, target) pairs that interacted
+    counts : numpy.ndarray
+        number of interactions per pair
+    """
+    selection = events[events['kind'] == kinds[kind]]
+    pairs = np.stack((selection['actor'], selection['target']), axis=1)
+    if len(pairs) == 0:
+        return pairs, np.zeros(0, dtype=int)
+
+    edges, counts = np.unique(pairs, axis=0, return_counts=True)
+
+    return edges, counts
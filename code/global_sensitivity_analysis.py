@@ -2,10 +2,17 @@
 
 # Imports
 import multiprocessing as mp
+import numpy as np
+import os
 import pandas as pd
 from SALib.sample import saltelli
 
 from model import *
+from sweep import *
+from cache import run_cache
+from store import merge_results, save_results
+from service import submit
+import workqueue
 
 variables = {
     'num_vars' : 5,
@@ -14,6 +21,27 @@ variables = {
 
 runs = 8
 
+# Run replicates per sample point until the confidence interval of every output is small enough
+# instead of running fixed copies of the whole design (the design is split over the processes)
+adaptive = False
+min_runs = 3
+max_runs = 30
+rel_width = 0.05
+
+# Seed of the first replicate (None for unseeded runs), seeded runs are stored in the cache
+# so an interrupted analysis can be resumed without simulating the finished runs again
+seed = None
+cache = run_cache('run_cache') if seed is not None else None
+
+# Address of a running sweep service (see service.py), e.g. ('localhost', 8765), the design with a fixed
+# number of replicates is then executed by its shared workers instead of one process per replicate
+service_address = None
+
+# Directory of a work queue on a filesystem shared by several machines (see workqueue.py), the runs of the
+# design are then executed by this process and by the workers started on the other machines with
+# python workqueue.py <directory> (without a seed, a random seed is drawn when the queue is created)
+queue_directory = None
+
 # Calculate sample points
 n_samples = 512
 param_values = saltelli.sample(variables, n_samples, calc_second_order=False)
@@ -30,37 +58,97 @@ def analysis(run):
         stackoverflow.distr[3][0] = setting[2]
         stackoverflow.distr[0][1] = setting[3]
         stackoverflow.distr[1][1] = setting[4]
-        
-        stackoverflow.run(20)
 
-        # Determine the total number of answers
-        n_answers = 0
-        for question in stackoverflow.questions:
-            n_answers += len(question.answers)
+        output = simulate(stackoverflow, 20, None if seed is None else seed + run, cache)
 
         # Write results and setting to dataframe
+        data.at[run * len(param_values) + ind, 'replicate'] = run
+        data.at[run * len(param_values) + ind, 'sample'] = ind
         data.at[run * len(param_values) + ind, 'bias'] = setting[0]
         data.at[run * len(param_values) + ind, 'mu_p_upvote'] = setting[1]
         data.at[run * len(param_values) + ind, 'mu_p_active'] = setting[2]
         data.at[run * len(param_values) + ind, 'std_p_ask'] = setting[3]
         data.at[run * len(param_values) + ind, 'std_p_answer'] = setting[4]
 
-        data.at[run * len(param_values) + ind, 'coeff_upvotes'] = stackoverflow.get_regression_coeff(data='upvotes', binsize=5)
-        data.at[run * len(param_values) + ind, 'coeff_reputation'] = stackoverflow.get_regression_coeff(data='reputation', binsize=125)
-        data.at[run * len(param_values) + ind, 'n_questions'] = len(stackoverflow.questions)
-        data.at[run * len(param_values) + ind, 'n_answers'] = n_answers
+        for param, value in output.items():
+            data.at[run * len(param_values) + ind, param] = value
 
         print(run, (ind+1) / len(param_values))
     
-    # Write to csv
-    data.to_csv('global_sa_%s.csv'%run)
+    # Write to a columnar file
+    save_results('global_sa_%s.npz'%run, data)
+
+def analysis_adaptive(run):
+    # Part of the design that is handled by this process
+    indices = np.array_split(np.arange(len(param_values)), runs)[run]
+
+    data = pd.DataFrame(index=indices, columns=['replicate', 'sample'] + variables['names'] + outputs + ['n_runs'])
+
+    for count, ind in enumerate(indices):
+        setting = param_values[ind]
+
+        # Setup the model
+        stackoverflow = network(150, 'tags.txt', bias=int(setting[0]))
+        for name, value in zip(variables['names'][1:], setting[1:]):
+            set_parameter(stackoverflow, name, value)
+
+        results, n_runs = run_adaptive(stackoverflow, 20, min_runs, max_runs, rel_width, seed=seed, cache=cache)
+
+        # Write the setting and the average of the replicates to the dataframe
+        data.at[ind, 'replicate'] = 0
+        data.at[ind, 'sample'] = ind
+        for name, value in zip(variables['names'], setting):
+            data.at[ind, name] = value
+        for output in outputs:
+            data.at[ind, output] = np.mean(results[output])
+        data.at[ind, 'n_runs'] = n_runs
+
+        print(run, (count+1) / len(indices), n_runs)
+
+    # Write to a columnar file
+    save_results('global_sa_adaptive_%s.npz'%run, data)
+
+def analysis_service():
+    # Replicate r of every sample point uses seed + r (same as analysis)
+    Y = submit(variables['names'], param_values, runs, 20, 150, seed=seed, address=service_address,
+               progress=lambda done, total: print(done / total))
+
+    # One row per run, sorted on replicate and sample
+    data = {'replicate': np.repeat(np.arange(runs), len(param_values)),
+            'sample': np.tile(np.arange(len(param_values)), runs)}
+    for i, name in enumerate(variables['names']):
+        data[name] = np.tile(param_values[:, i], runs)
+    for i, output in enumerate(outputs):
+        data[output] = Y[:, :, i].T.ravel()
+
+    save_results('global_sa.npz', data)
+
+def analysis_queue():
+    # The queue is created by the first machine, an interrupted analysis continues with the remaining tasks
+    if not os.path.isdir(os.path.join(queue_directory, 'todo')):
+        workqueue.create(queue_directory, variables['names'], param_values, runs, 20, 150, seed)
+
+    workqueue.work(queue_directory)
+    print(workqueue.count(queue_directory))
+
+    # One row per run, sorted on replicate and sample (raises an error if the design is incomplete)
+    workqueue.merge(queue_directory, 'global_sa.npz')
 
 if __name__ == '__main__':
-    processes = []
-    for i in range(runs):
-        p = mp.Process(target=analysis, args=(i,))
-        p.start()
-        processes.append(p)
-
-    for p in processes:
-        p.join()
+    if service_address is not None and not adaptive:
+        analysis_service()
+    elif queue_directory is not None and not adaptive:
+        analysis_queue()
+    else:
+        processes = []
+        for i in range(runs):
+            p = mp.Process(target=analysis_adaptive if adaptive else analysis, args=(i,))
+            p.start()
+            processes.append(p)
+
+        for p in processes:
+            p.join()
+
+        # Single file with the results of all processes (sorted on replicate and sample with store.sobol_outputs)
+        name = 'global_sa_adaptive' if adaptive else 'global_sa'
+        merge_results(['%s_%s.npz'%(name, i) for i in range(runs)], '%s.npz'%name)
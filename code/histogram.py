@@ -0,0 +1,140 @@
+"""Module containing a histogram that is updated during the simulation."""
+
+# Imports
+import numpy as np
+
+
+class histogram:
+    """
+    Histogram with fixed-width bins of non-negative values that is updated incrementally.
+
+    Attributes
+    ----------
+    binsize : float
+        length of one interval
+    counts : numpy.ndarray
+        number of values in every bin (grows when needed)
+    n_values : int
+        total number of values
+    top : int
+        index of the highest non-empty bin (-1 if the histogram is empty)
+
+    Methods
+    -------
+    add(value)
+        Add a value to the histogram.
+    remove(value)
+        Remove a value from the histogram.
+    move(old, new)
+        Change a value that is in the histogram.
+    clear()
+        Remove all values from the histogram.
+    get_distr()
+        Get the distribution of the values.
+    n_nonempty()
+        Number of bins that contain values.
+    """
+
+    def __init__(self, binsize, n_bins=64):
+        """
+        Initialize an empty histogram.
+
+        Parameters
+        ----------
+        binsize : float
+            length of one interval
+        n_bins : int
+            number of bins that is allocated initially, default is 64
+        """
+        self.binsize = binsize
+        self.counts = np.zeros(n_bins, dtype=np.int64)
+        self.n_values = 0
+        self.top = -1
+
+    def add(self, value):
+        """
+        Add a value to the histogram.
+
+        Parameters
+        ----------
+        value : float
+            value to add
+        """
+        ind = int(value // self.binsize)
+        if ind >= len(self.counts):
+            # Double the number of bins until the value fits
+            n_bins = len(self.counts)
+            while ind >= n_bins:
+                n_bins *= 2
+            self.counts = np.concatenate((self.counts, np.zeros(n_bins - len(self.counts), dtype=np.int64)))
+
+        self.counts[ind] += 1
+        self.n_values += 1
+        if ind > self.top:
+            self.top = ind
+
+    def remove(self, value):
+        """
+        Remove a value from the histogram.
+
+        Parameters
+        ----------
+        value : float
+            value to remove
+        """
+        ind = int(value // self.binsize)
+        self.counts[ind] -= 1
+        self.n_values -= 1
+
+        # Find the new highest non-empty bin
+        while self.top >= 0 and self.counts[self.top] == 0:
+            self.top -= 1
+
+    def move(self, old, new):
+        """
+        Change a value that is in the histogram.
+
+        Parameters
+        ----------
+        old : float
+            current value
+        new : float
+            new value
+        """
+        if old // self.binsize != new // self.binsize:
+            self.add(new)
+            self.remove(old)
+
+    def clear(self):
+        """Remove all values from the histogram."""
+        self.counts[:] = 0
+        self.n_values = 0
+        self.top = -1
+
+    def get_distr(self):
+        """
+        Get the distribution of the values.
+
+        Returns
+        -------
+        pdf : numpy.ndarray
+            probability density function of the values
+        bins : numpy.ndarray
+            (right) edges of the bins
+        """
+        n_bins = self.top + 1
+        bins = self.binsize * np.arange(1, n_bins + 1)
+        pdf = self.counts[:n_bins] / self.n_values
+
+        return pdf, bins
+
+    def n_nonempty(self):
+        """
+        Number of bins that contain values.
+
+        Returns
+        -------
+        n_bins : int
+            number of non-empty bins
+        """
+        return int(np.count_nonzero(self.counts[:self.top + 1]))
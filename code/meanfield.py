@@ -0,0 +1,623 @@
+"""Deterministic mean-field approximation of the interaction network (fast screening of parameter settings)."""
+
+# Imports
+import collections
+import time
+import numpy as np
+import pandas as pd
+import scipy.stats
+from scipy.special import expit, gammainc, pdtr, pdtrc, wrightomega
+from scipy.stats import qmc
+
+import utils
+from model import network
+from sweep import outputs, get_output, run_replicates, set_parameter
+
+# Sensitivity coefficient and maximum difference of the feedback rule (same as user.update_p)
+coeff = 0.1
+max_diff = 5
+# Number of timesteps between asking a question and the evaluation of the upvotes (age of the question)
+lag = 2
+# Limit of the logit of the probabilities (probabilities of exactly 0 or 1)
+max_logit = 20
+# Number of points of the average over the position of a user among the viewers of a question
+n_quadrature = 8
+# Outputs of the approximation and their largest relative error measured with validate() on the grid of __main__
+# (n=150, t=20, 5 replicates). At n=60, t=12 the errors were at most 0.04 (n_questions) and 0.12 (n_answers).
+error_bounds = {'n_questions': 0.16, 'n_answers': 0.63}
+
+
+def sequential(n, x, a0=0):
+    """
+    Expected number of successes in a sequence of trials where the logit of the success probability
+    decreases by one with every success (as for answering and upvoting).
+
+    The first trial is exact, the remaining trials follow the continuum limit da/dn = sigmoid(x - a),
+    which is solved exactly with the Wright omega function.
+
+    Parameters
+    ----------
+    n : numpy.ndarray
+        (expected) number of trials
+    x : numpy.ndarray
+        logit of the probability of the first trial (without successes)
+    a0 : numpy.ndarray
+        number of successes before the first trial, default is 0
+
+    Returns
+    -------
+    a : numpy.ndarray
+        expected number of successes (including a0)
+    """
+    first = expit(x - a0)
+    a1 = a0 + first
+
+    s = np.maximum(n - 1, 0) + a1 + np.exp(np.minimum(a1 - x, 700))
+
+    return np.where(n <= 1, a0 + n * first, s - wrightomega(s - x))
+
+
+def feedback_diff(mean, bias):
+    """
+    Expected difference of the feedback rule (user.update_p) when the number of upvotes is a Poisson count.
+
+    The difference is clipped (max_diff), so its expectation over the distribution of the upvotes
+    differs from the difference at the mean number of upvotes.
+
+    Parameters
+    ----------
+    mean : numpy.ndarray
+        mean number of upvotes on a question or answer
+    bias : float
+        number of upvotes a user is satisfied with
+
+    Returns
+    -------
+    diff : numpy.ndarray
+        expected value of the clipped difference between the number of upvotes and the bias
+    """
+    mean = np.asarray(mean, dtype=float)
+    # Counts below the upper limit of the difference, larger counts give max_diff
+    k = np.arange(max(int(np.ceil(bias + max_diff)), 0))
+    if len(k) == 0:
+        return np.full(mean.shape, float(max_diff))
+
+    pmf = scipy.stats.poisson.pmf(k, mean[..., None])
+
+    return pmf @ np.clip(k - bias, -max_diff, max_diff) + max_diff * pdtrc(k[-1], mean)
+
+
+def answer_curve(tag, mass, x, n_tags, fraction, width=0.25):
+    """
+    Expected number of answers on a question after a fraction of its viewers (in random order) have seen it.
+
+    Every viewer answers with probability sigmoid(x - answers), so the number of answers follows
+    da/df = sum over the viewers of sigmoid(x - a), which is integrated (Runge-Kutta) for every tag
+    on a histogram of the logits of the viewers.
+
+    Parameters
+    ----------
+    tag : numpy.ndarray
+        tag of every node
+    mass : numpy.ndarray
+        expected number of viewers of a question for every node
+    x : numpy.ndarray
+        logit of p_answer of every node
+    n_tags : int
+        number of tags
+    fraction : numpy.ndarray
+        increasing fractions of the viewers (the first and last are at half a step from 0 and 1)
+    width : float
+        width of the bins of the histogram of the logits, default is 0.25
+
+    Returns
+    -------
+    answers : numpy.ndarray (n_tags x len(fraction))
+        expected number of answers after every fraction of the viewers
+    """
+    n_bins = int(np.ceil(2 * max_logit / width)) + 1
+    bins = np.round((x + max_logit) / width).astype(int)
+    viewers = np.bincount(tag * n_bins + bins, mass, minlength=n_tags * n_bins).reshape(n_tags, n_bins)
+    centers = width * np.arange(n_bins) - max_logit
+
+    def rate(a):
+        return np.sum(viewers * expit(centers - a[:, None]), axis=1)
+
+    # Steps of half the distance between the fractions
+    h = fraction[0]
+    a = np.zeros(n_tags)
+    answers = np.empty((n_tags, len(fraction)))
+    for i in range(2 * len(fraction) - 1):
+        k1 = rate(a)
+        k2 = rate(a + h * k1 / 2)
+        k3 = rate(a + h * k2 / 2)
+        k4 = rate(a + h * k3)
+        a = a + h * (k1 + 2 * k2 + 2 * k3 + k4) / 6
+        if i % 2 == 0:
+            answers[:, i // 2] = a
+
+    return answers
+
+
+def initial_probabilities(distr, u):
+    """
+    Probabilities of the representative users (quantiles of the distributions of model.network.create_user).
+
+    Parameters
+    ----------
+    distr : list (4 x 2)
+        type and parameters of the distributions (see model.network)
+    u : numpy.ndarray (Q x 4)
+        points in the unit hypercube
+
+    Returns
+    -------
+    p : numpy.ndarray (Q x 4)
+        p_ask, p_answer, p_interact and p_active of every representative user
+    """
+    p = np.empty(u.shape)
+    for i, param in enumerate(distr):
+        if param[0] is None:
+            # Uniform distribution
+            p[:, i] = u[:, i]
+        elif param[1] is None:
+            # Exponential distribution
+            p[:, i] = scipy.stats.truncexpon.ppf(u[:, i], param[0]) / param[0]
+        else:
+            # Normal distribution
+            mu, sigma = param
+            p[:, i] = scipy.stats.truncnorm.ppf(u[:, i], (0 - mu) / sigma, (1 - mu) / sigma, loc=mu, scale=sigma)
+
+    return p
+
+
+class meanfield:
+    """
+    Mean-field approximation of the interaction network of Stack overflow.
+
+    Every timestep, the new users of every tag are represented by n_nodes deterministic nodes
+    (quasi-random quantiles of the distributions of the probabilities), each carrying an equal share of the users.
+    Instead of single interactions, the expected number of questions, answers and upvotes of every node are computed
+    with the same rules as the agent-based model (user.ask_question, user.answer_question, user.upvote),
+    and the probabilities are changed with the expected effect of the feedback rule (user.update_p) two timesteps later
+    (averaged over a Poisson number of upvotes on every question and answer, as the difference is clipped).
+    The reputation and the number of upvotes given by a user of a node are modelled as Poisson counts,
+    which gives the upvoting privilege and the distributions of reputation and upvotes.
+
+    The engine has the same parameters and output as model.network, so it can be used in the sweeps
+    (e.g. sweep.evaluate(..., engine=meanfield)). Only the counts are approximated: n_questions and n_answers
+    are within error_bounds (relative error) of the mean of the agent-based model, the regression coefficients
+    are nan (the distributions of the nodes miss the heavy tails of the agent-based model).
+    The largest errors are underestimates of n_answers in long runs with many users: in the agent-based model
+    the users whose answers get many upvotes stay active, which the average feedback of a node misses.
+
+    Attributes
+    ----------
+    new_users : int
+        number of users added every timestep
+    upvote_treshold : int
+        minimum reputation to gain upvoting privilige
+    upvote_bias : int
+        number of upvotes a user is satisfied with
+    distr : list
+        contains the type and parameters of the distributions from which the probabilities are sampled
+    tag_pdf : numpy.ndarray
+        probability of the tags (communities)
+    tag_cdf : numpy.ndarray
+        cummulative distribution function of the tags (communities)
+    n_nodes : int
+        number of nodes per tag that are added every timestep
+    seed : int
+        seed of the quasi-random quantiles of the nodes
+    time : int
+        number of timesteps executed
+    n_questions : float
+        expected number of questions asked
+    n_answers : float
+        expected number of answers given
+    n_upvotes : float
+        expected number of upvotes given
+    tag : numpy.ndarray
+        tag of every node
+    weight : numpy.ndarray
+        number of users represented by every node
+    logit : numpy.ndarray (nodes x 4)
+        logit of p_ask, p_answer, p_interact and p_active of every node
+    events : numpy.ndarray
+        expected number of reputation gains of a user (upvotes received and best answers) for every node
+    gain : numpy.ndarray
+        expected reputation gained by a user for every node
+    loss : numpy.ndarray
+        expected reputation lost by a user (unanswered questions) for every node
+    upvotes_given : numpy.ndarray
+        expected number of upvotes given by a user for every node
+
+    Methods
+    -------
+    add_nodes()
+        Add the nodes of the new users.
+    privileged_fraction()
+        Fraction of the users of every node with upvoting privilege.
+    step()
+        Single timestep of the model.
+    run(t)
+        Execute the model for a number of timesteps.
+    reset()
+        Reset the system (does not change the parameter settings).
+    get_upvote_distr(binsize)
+        Get the distribution of upvotes given per user.
+    get_reputation_distr(binsize)
+        Get the distribution of reputation.
+    get_regression_coeff(data, binsize)
+        Calculate the linear regression coefficient of the distribution of upvotes or reputation.
+    """
+
+    def __init__(self, n, tags, treshold=15, bias=12, distr=[[0.5, 0.25], [0.5, 0.25], [0.5, 0.25], [0.5, 0.25]],
+                 n_nodes=16, seed=0):
+        """
+        Initialize a mean-field approximation.
+
+        Parameters
+        ----------
+        n : int
+            number of users added every timestep
+        tags : str
+            .txt file containing probabilities of the different communities
+        treshold : int
+            minimum reputation to gain upvoting privilige, default is 15
+        bias : int
+            number of upvotes a user is satisfied with, default is 12
+        distr : list (4 x 2)
+            contains the mean and std of the distributions from which the probabilities are sampled (see model.network)
+        n_nodes : int
+            number of nodes per tag that are added every timestep, default is 16
+        seed : int
+            seed of the quasi-random quantiles of the nodes, default is 0
+        """
+        self.new_users = n
+        self.upvote_treshold = treshold
+        self.upvote_bias = bias
+        self.distr = [list(param) for param in distr]
+        self.n_nodes = n_nodes
+        self.seed = seed
+
+        tag_pdf = np.loadtxt(tags, usecols=1)
+        self.tag_pdf = tag_pdf / np.sum(tag_pdf)
+        self.tag_cdf = utils.calc_cdf(self.tag_pdf)
+
+        self.reset()
+
+    def reset(self):
+        """Reset the system (does not change the parameter settings)."""
+        self.time = 0
+        self.n_questions = 0
+        self.n_answers = 0
+        self.n_upvotes = 0
+
+        self.tag = np.zeros(0, dtype=int)
+        self.weight = np.zeros(0)
+        self.logit = np.zeros((0, 4))
+        self.events = np.zeros(0)
+        self.gain = np.zeros(0)
+        self.loss = np.zeros(0)
+        self.upvotes_given = np.zeros(0)
+
+        # Feedback of the questions that are not yet evaluated (oldest first)
+        self._delayed = collections.deque()
+        # Logits of the nodes of new users (determined at the first timestep, after the parameters are set)
+        self._initial = None
+
+    def add_nodes(self):
+        """Add the nodes of the new users."""
+        n_tags = len(self.tag_pdf)
+
+        if self._initial is None:
+            u = qmc.Sobol(d=4, seed=self.seed).random(self.n_nodes)
+            p = np.clip(initial_probabilities(self.distr, u), expit(-max_logit), expit(max_logit))
+            self._initial = np.log(p) - np.log1p(-p)
+        logit = self._initial
+
+        self.tag = np.concatenate((self.tag, np.repeat(np.arange(n_tags), self.n_nodes)))
+        self.weight = np.concatenate((self.weight, np.repeat(self.new_users * self.tag_pdf / self.n_nodes, self.n_nodes)))
+        self.logit = np.concatenate((self.logit, np.tile(logit, (n_tags, 1))))
+
+        new = np.zeros(n_tags * self.n_nodes)
+        self.events = np.concatenate((self.events, new))
+        self.gain = np.concatenate((self.gain, new))
+        self.loss = np.concatenate((self.loss, new))
+        self.upvotes_given = np.concatenate((self.upvotes_given, new))
+
+    def privileged_fraction(self):
+        """
+        Fraction of the users of every node with upvoting privilege.
+
+        Returns
+        -------
+        fraction : numpy.ndarray
+            probability that the reputation of a user is at least the treshold
+        """
+        # Users start with a reputation of 1
+        needed = self.upvote_treshold - 1
+        if needed <= 0:
+            return np.ones(len(self.weight))
+
+        # Number of gains needed, given the average gain of the node (an upvote if nothing was gained yet)
+        average = np.divide(self.gain, self.events, out=np.full(len(self.events), 10.0), where=self.events > 0)
+        k = np.ceil(needed / average)
+
+        # P(Poisson(events) >= k)
+        return gammainc(k, self.events)
+
+    def step(self):
+        """Single timestep of the model."""
+        self.add_nodes()
+        n_tags = len(self.tag_pdf)
+        tag = self.tag
+        weight = self.weight
+
+        # Evaluate the questions that were asked lag timesteps ago
+        if len(self._delayed) == lag:
+            delayed = self._delayed.popleft()
+            m = len(delayed['events'])
+            self.logit[:m] = np.clip(self.logit[:m] + delayed['logit'], -max_logit, max_logit)
+            self.events[:m] += delayed['events']
+            self.gain[:m] += delayed['gain']
+            self.loss[:m] += delayed['loss']
+
+        p_ask, _, _, p_active = expit(self.logit).T
+        x_answer = self.logit[:, 1]
+        x_interact = self.logit[:, 2]
+        privileged = self.privileged_fraction()
+
+        # Expected number of questions per tag
+        questions = np.bincount(tag, weight * p_ask, minlength=n_tags)
+
+        # Users see a question with probability p_active. The users are processed in order of activity,
+        # starting after the asker (the others see the question in the next timestep), so on average
+        # a user sees the question after a uniformly distributed fraction of the other viewers
+        mass = weight * p_active
+        total_mass = np.bincount(tag, mass, minlength=n_tags)
+        fraction = (np.arange(n_quadrature) + 0.5) / n_quadrature
+
+        # Answers given on a question before a user sees it
+        n_seen = answer_curve(tag, mass, x_answer, n_tags, fraction)
+        p_seen = expit(x_answer[:, None] - n_seen[tag])
+        p_answered = np.mean(p_seen, axis=1)
+
+        # Answers per question and the probability that a question remains unanswered
+        answers_per_q = np.bincount(tag, mass * p_answered, minlength=n_tags)
+        unanswered = np.exp(np.bincount(tag, mass * np.log1p(-expit(x_answer)), minlength=n_tags))
+
+        # Visible questions of a user (not the own question)
+        visible = p_active * np.maximum(questions[tag] - p_ask, 0)
+        answers = visible * p_answered
+
+        # Upvotes of privileged users on the visible questions (the logit decreases with every upvote of this timestep)
+        upvotes_q = privileged * sequential(visible, x_interact)
+        # and on the answers of the questions that they do not answer themselves
+        # (p_interact has no feedback, so the nodes only differ in their quantile)
+        quantile = np.arange(len(tag)) % self.n_nodes
+        upvotes_seen = sequential(n_seen[:, :, None], self._initial[:, 2])
+        upvotes_a = privileged * np.mean((1 - p_seen) * upvotes_seen[tag, :, quantile], axis=1)
+
+        q_upvotes = np.divide(np.bincount(tag, weight * upvotes_q, minlength=n_tags), questions,
+                              out=np.zeros(n_tags), where=questions > 0)
+        a_upvotes = np.divide(np.bincount(tag, mass * upvotes_a, minlength=n_tags), answers_per_q,
+                              out=np.zeros(n_tags), where=answers_per_q > 0)
+
+        # Upvotes are received immediately (10 reputation each)
+        received = p_ask * q_upvotes[tag] + answers * a_upvotes[tag]
+        self.events += received
+        self.gain += 10 * received
+        self.upvotes_given += upvotes_q + visible * upvotes_a
+
+        # Feedback of the evaluation (best answer, unanswered question and probabilities) after lag timesteps
+        best = np.divide(answers * (1 - unanswered[tag]), answers_per_q[tag],
+                         out=np.zeros(len(tag)), where=answers_per_q[tag] > 0)
+        diff_q = coeff * feedback_diff(q_upvotes, self.upvote_bias)[tag]
+        diff_a = coeff * feedback_diff(a_upvotes, self.upvote_bias)[tag]
+
+        logit = np.zeros(self.logit.shape)
+        logit[:, 0] = p_ask * diff_q
+        logit[:, 1] = answers * diff_a
+        logit[:, 3] = p_ask * diff_q + answers * diff_a
+        self._delayed.append({'logit': logit, 'events': best, 'gain': 15 * best, 'loss': 2 * p_ask * unanswered[tag]})
+
+        self.n_questions += np.sum(questions)
+        self.n_answers += np.sum(weight * answers)
+        self.n_upvotes += np.sum(weight * (upvotes_q + visible * upvotes_a))
+        self.time += 1
+
+    def run(self, t):
+        """
+        Execute the model for a number of timesteps.
+
+        Parameters
+        ----------
+        t : int
+            number of timesteps
+        """
+        for _ in range(t):
+            self.step()
+
+    def poisson_distr(self, mean, offset, scale, binsize, lower=0):
+        """
+        Distribution of the population when the value of a user of a node is max(offset + scale * Poisson(mean), lower).
+
+        Bins in which less than half a user is expected are left empty (as in a finite population).
+
+        Parameters
+        ----------
+        mean : numpy.ndarray
+            mean of the Poisson count for every node
+        offset : numpy.ndarray
+            value without events for every node
+        scale : numpy.ndarray
+            change of the value per event for every node
+        binsize : float
+            length of one interval
+        lower : float
+            minimum value, default is 0
+
+        Returns
+        -------
+        pdf : numpy.ndarray
+            probability density function
+        bins : numpy.ndarray
+            edges of the bins
+        """
+        # Only the counts around the mean contribute, which cover a few bins per node
+        spread = 6 * np.sqrt(mean) + 2
+        low = np.maximum(offset + scale * np.maximum(mean - spread, 0), lower)
+        high = np.maximum(offset + scale * (mean + spread), lower)
+        first = (low // binsize).astype(int)
+        b = first[:, None] + np.arange(int(np.max(high // binsize - first)) + 1)
+
+        # Probability of every bin from the Poisson cdf at the largest count below the upper edge of the bin
+        k = np.ceil(((b + 1) * binsize - offset[:, None]) / scale[:, None]) - 1
+        cdf = np.where(k < 0, 0, pdtr(np.maximum(k, 0), mean[:, None]))
+        cdf[:, -1] = 1
+        users = self.weight[:, None] * np.diff(cdf, prepend=0, axis=1)
+
+        pdf = np.bincount(b.ravel(), users.ravel())
+        pdf[pdf < 0.5] = 0
+        bins = binsize * np.arange(1, len(pdf) + 1)
+
+        return pdf / np.sum(pdf), bins
+
+    def get_upvote_distr(self, binsize):
+        """
+        Get the distribution of upvotes given per user.
+
+        Parameters
+        ----------
+        binsize : float
+            length of one interval
+
+        Returns
+        -------
+        pdf : numpy.ndarray
+            probability density function of the number of upvotes
+        bins : numpy.ndarray
+            edges of the bins
+        """
+        n = len(self.weight)
+
+        return self.poisson_distr(self.upvotes_given, np.zeros(n), np.ones(n), binsize)
+
+    def get_reputation_distr(self, binsize):
+        """
+        Get the distribution of reputation.
+
+        Parameters
+        ----------
+        binsize : float
+            length of one interval
+
+        Returns
+        -------
+        pdf : numpy.ndarray
+            probability density function of the reputation
+        bins : numpy.ndarray
+            edges of the bins
+        """
+        average = np.divide(self.gain, self.events, out=np.full(len(self.events), 10.0), where=self.events > 0)
+
+        # Reputation starts at 1 and cannot drop below 1
+        return self.poisson_distr(self.events, 1 - self.loss, average, binsize, lower=1)
+
+    def get_regression_coeff(self, data='upvotes', binsize=20):
+        """
+        Regression coefficient of the distribution of upvotes or reputation (not approximated).
+
+        The distributions of the nodes have much thinner tails than those of the agent-based model
+        (the coefficients were 10-50% steeper in validate()), so no coefficient is given.
+
+        Parameters
+        ----------
+        data : str ('upvotes' or 'reputation')
+            specifies for which distribution the coefficient should be calculated, default is upvotes
+        binsize : float
+            length of the interval used in calculating the pdf
+
+        Returns
+        -------
+        coeff : float
+            nan
+        """
+        return np.nan
+
+
+def validate(settings, t=20, n=150, runs=5, seed=0, tags='tags.txt'):
+    """
+    Compare the output of the mean-field approximation with replicates of the agent-based model.
+
+    Parameters
+    ----------
+    settings : list
+        parameter settings, every setting is a dictionary with the value of the parameters
+        that differ from the default (names as in sweep.set_parameter)
+    t : int
+        number of timesteps, default is 20
+    n : int
+        number of users added every timestep, default is 150
+    runs : int
+        number of replicates of the agent-based model, default is 5
+    seed : int
+        seed of the first replicate, default is 0
+    tags : str
+        .txt file containing probabilities of the different communities, default is tags.txt
+
+    Returns
+    -------
+    comparison : pandas.DataFrame
+        for every setting and output the mean and std of the agent-based model, the mean-field value,
+        the relative error, the z-score of the mean-field value, the error bound of the output (error_bounds,
+        nan for the outputs that are not approximated), whether the error is within the bound
+        and the run time of both engines
+    """
+    rows = []
+    for i, setting in enumerate(settings):
+        stackoverflow = network(n, tags)
+        approximation = meanfield(n, tags)
+        for var, value in setting.items():
+            set_parameter(stackoverflow, var, value)
+            set_parameter(approximation, var, value)
+
+        begin = time.perf_counter()
+        data = run_replicates(stackoverflow, t, runs, seed)
+        time_abm = (time.perf_counter() - begin) / runs
+
+        begin = time.perf_counter()
+        approximation.run(t)
+        output = get_output(approximation)
+        time_mf = time.perf_counter() - begin
+
+        for name in outputs:
+            mean = np.mean(data[name])
+            std = np.std(data[name], ddof=1) if runs > 1 else np.nan
+            rel_error = (output[name] - mean) / np.abs(mean) if mean != 0 else np.nan
+            bound = error_bounds.get(name, np.nan)
+            rows.append({'setting': i, 'output': name, 'abm_mean': mean, 'abm_std': std, 'meanfield': output[name],
+                         'rel_error': rel_error, 'z': (output[name] - mean) / std if std > 0 else np.nan,
+                         'bound': bound, 'within': bool(np.abs(rel_error) <= bound),
+                         'time_abm': time_abm, 'time_meanfield': time_mf})
+
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    # Default setting and a coarse one-factor-at-a-time grid around it
+    settings = [{}]
+    for var, values in {'bias': [1, 25, 40], 'treshold': [1, 30], 'mu_p_upvote': [0.2, 0.8],
+                        'mu_p_active': [0.2, 0.8], 'mu_p_ask': [0.2, 0.8]}.items():
+        settings += [{var: value} for value in values]
+
+    comparison = validate(settings)
+    pd.set_option('display.width', 200)
+    pd.set_option('display.max_columns', None)
+    print(comparison)
+    # Largest error of the approximated outputs (error_bounds)
+    counts = comparison[comparison['output'].isin(list(error_bounds))]
+    print(counts.groupby('output')[['rel_error', 'z']].agg(lambda x: np.max(np.abs(x))))
+    print('Within the error bounds:', counts['within'].all())
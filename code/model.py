@@ -1,9 +1,13 @@
 """Class that represents the interaction network of Stack overflow."""
 
 # Imports
+import gc
+import heapq
 import numpy as np
 from sklearn.linear_model import LinearRegression
 
+import histogram
+import population
 import user as agent
 import utils
 
@@ -25,11 +29,37 @@ class network:
     tag_cdf : numpy.ndarray
         cummulative distribution function of the tags (communities)
     tags : list
-        contains the ids of the users with a certain tag for all tags
+        contains the ids of the users with a certain tag for all tags (from the index of the population)
     users : list
         contains all the users in the system
+    agents : .population.population
+        compact arrays with the attributes of the users (the users are views on these arrays)
     questions : list
         all the questions ever asked during the simulation
+    time : int
+        number of timesteps executed
+    n_questions : int
+        number of questions asked
+    n_answers : int
+        number of answers given
+    n_upvotes : int
+        number of upvotes given (questions and answers)
+    reputation_total : int
+        sum of the reputation of all users
+    p_total : numpy.ndarray
+        sum of the probabilities (p_ask, p_answer, p_interact, p_active) of all users
+    reputation_hist : .histogram.histogram
+        live histogram of the reputation of all users
+    upvote_hist : .histogram.histogram
+        live histogram of the number of upvotes given per user
+    converged_at : int
+        timestep at which the last run converged (None if it did not converge or no tolerance was given)
+    recorder : .events.recorder
+        optional recorder to which all events are written, default is None
+    pending : set
+        ids of the users that have questions that are not yet evaluated
+    visible : set
+        ids of the users that have visible questions
 
     Methods
     -------
@@ -39,11 +69,29 @@ class network:
         Create a new user.
     step()
         Single timestep of the model.
-    run(t)
-        Execute the model for a certain number of timesteps.
+    priority(id)
+        Position of a user in the order of the current timestep.
+    notify(id)
+        Register that a question became visible for a user.
+    run(t, observers, tol, every, window)
+        Execute the model for a certain number of timesteps (or until the power law exponents converge).
+    close(observers)
+        Stop the observers and flush the recorder at the end of a run.
+    reset()
+        Reset the system (does not change the parameter settings).
+    reserve(n_users)
+        Allocate the storage for a number of users at once.
+    set_reputation(user, reputation)
+        Change the reputation of a user.
+    count_upvote(user)
+        Register an upvote given by a user.
     """
 
-    def __init__(self, n, tags, treshold=15, bias=12, distr=[[0.5, 0.25], [0.5, 0.25], [0.5, 0.25], [0.5, 0.25]]):
+    # Interaction probabilities of a user (same order as distr)
+    probabilities = ['p_ask', 'p_answer', 'p_interact', 'p_active']
+
+    def __init__(self, n, tags, treshold=15, bias=12, distr=[[0.5, 0.25], [0.5, 0.25], [0.5, 0.25], [0.5, 0.25]],
+                 binsize_upvotes=5, binsize_reputation=125):
         """
         Initialize an interaction network.
 
@@ -63,23 +111,51 @@ class network:
             default values are mean 0.5 and std 0.25 (normal distribution)
             for uniform distribution, set the mean to None
             for exponential distribution set the mean equal to the rate and the std to None
+        binsize_upvotes : float
+            length of the interval of the live histogram of upvotes given, default is 5
+        binsize_reputation : float
+            length of the interval of the live histogram of reputation, default is 125
         """
         self.new_users = n
         self.upvote_treshold = treshold
         self.upvote_bias = bias
 
-        # Distributions for the interaction parameters of the users
-        self.distr = distr
+        # Distributions for the interaction parameters of the users (copy, the default is shared)
+        self.distr = [list(param) for param in distr]
 
         # Calculate the cummulative distribution of the tags
         tag_pdf = np.loadtxt(tags, usecols=1)
         tag_pdf = tag_pdf / np.sum(tag_pdf)
         self.tag_cdf = utils.calc_cdf(tag_pdf)
 
-        self.tags = [[] for _ in range(len(tag_pdf))]
         self.users = []
+        self.agents = population.population()
         self.questions = []
 
+        # Summary statistics that are updated during the simulation
+        self.time = 0
+        self.n_questions = 0
+        self.n_answers = 0
+        self.n_upvotes = 0
+        self.reputation_total = 0
+        self.p_total = np.zeros(len(self.probabilities))
+        self.reputation_hist = histogram.histogram(binsize_reputation)
+        self.upvote_hist = histogram.histogram(binsize_upvotes)
+        self.converged_at = None
+        self.recorder = None
+
+        # Users that have something to do in the next timestep (besides asking)
+        self.pending = set()
+        self.visible = set()
+
+        # Dispatch state of the timestep in progress
+        self._queue = None
+
+    @property
+    def tags(self):
+        """Ids of the users with a certain tag for all tags."""
+        return [self.agents.id[self.agents.with_tag(tag)] for tag in range(len(self.tag_cdf))]
+
     def determine_tag(self):
         """
         Determine the tag of a user.
@@ -112,13 +188,12 @@ class network:
         """
         # Tag
         tag = self.determine_tag()
-        self.tags[tag].append(i)
 
-        # User
+        # User (the population keeps the index of the members of every tag)
         new_user = agent.user(self, i, tag)
 
         # Probabilities
-        attributes = ['p_ask', 'p_answer', 'p_interact', 'p_active']
+        attributes = self.probabilities
         for i, param in enumerate(self.distr):
             if param[0] is None:
                 # Uniform distribution
@@ -142,30 +217,252 @@ class network:
             user = self.create_user(len(self.users))
             self.users.append(user)
 
-        # Iterate over users based on activity, most active users go first
-        order = list(np.copy(self.users))
-        order.sort(key=lambda x: x.p_active, reverse=True)
-        for user in order:
-            user.step()
+            self.reputation_total += user.reputation
+            self.p_total += [getattr(user, param) for param in self.probabilities]
+            self.reputation_hist.add(user.reputation)
+            self.upvote_hist.add(0)
+
+        # Iterate over users based on activity (at the start of the timestep), most active users go first
+        n_users = len(self.users)
+        if self.agents.size == n_users:
+            # All users were created by the network, the slot of a user is its id
+            p_active = self.agents.p_active[:n_users].copy()
+            p_ask = self.agents.p_ask[:n_users]
+        else:
+            # Users that were created outside the network (e.g. in tests)
+            slots = np.array([user.slot for user in self.users], dtype=int)
+            p_active = self.agents.p_active[slots]
+            p_ask = self.agents.p_ask[slots]
+        # The bits of a positive float32 increase with its value, so the order follows from the bits
+        # without sorting all users (see priority)
+        self._activity = p_active.view(np.uint32)
+
+        # Draw all decisions to ask a question at once
+        self._u_ask = np.random.uniform(size=n_users)
+
+        # Only users that ask a question, have questions to evaluate or visible questions need to take a step,
+        # users that get a visible question during this timestep are added when it happens (see notify)
+        self._scheduled = set(np.flatnonzero(self._u_ask < p_ask).tolist()) | self.pending | self.visible
+        self._queue = [self.priority(id) for id in self._scheduled]
+        heapq.heapify(self._queue)
+
+        while self._queue:
+            self._current = heapq.heappop(self._queue)
+            id = self._current & 0xFFFFFFFF
+            self.users[id].step(self._u_ask[id])
+
+        self._queue = None
+        self.time += 1
+
+    def priority(self, id):
+        """
+        Position of a user in the order of the current timestep (most active first, ties by id).
+
+        Parameters
+        ----------
+        id : int
+            id of the user
 
-    def run(self, t):
+        Returns
+        -------
+        priority : int
+            lower values take their step earlier
+        """
+        return ((0xFFFFFFFF - int(self._activity[id])) << 32) | id
+
+    def notify(self, id):
         """
-        Execute the model for a certain number of timesteps.
+        Register that a question became visible for a user.
+
+        Parameters
+        ----------
+        id : int
+            id of the user
+        """
+        self.visible.add(id)
+
+        # Schedule the user if its turn in the current timestep is still to come
+        if self._queue is not None and id not in self._scheduled:
+            priority = self.priority(id)
+            if priority > self._current:
+                self._scheduled.add(id)
+                heapq.heappush(self._queue, priority)
+
+    def run(self, t, observers=[], tol=None, every=5, window=3):
+        """
+        Execute the model for a certain number of timesteps (or until the power law exponents converge).
 
         Parameters
         ----------
         t : int
-            number of timesteps
+            (maximum) number of timesteps
+        observers : list
+            objects (e.g. observer.collector) that are notified at the start (start), after every timestep (update)
+            and at the end of the run (stop), default is none
+        tol : float
+            if given, stop when the regression coefficients of the upvote and reputation distribution
+            change less than tol over the last window evaluations, default is None (always run t timesteps)
+        every : int
+            number of timesteps between two evaluations of the regression coefficients, default is 5
+        window : int
+            number of evaluations over which the coefficients have to be stable, default is 3
+
+        Returns
+        -------
+        converged_at : int
+            timestep at which the coefficients converged (None if they did not converge or tol is None)
+        """
+        self.converged_at = None
+        coeffs = []
+
+        # The storage of all users of the run is allocated at once
+        self.reserve(len(self.users) + self.new_users * t)
+
+        for obs in observers:
+            obs.start(self, t)
+
+        # The cyclic garbage collector would scan all objects of the model (users, questions and answers)
+        # repeatedly while they are created, so it is paused during the run. The users and the network
+        # reference each other (user.system), this cycle is collected once the collector is enabled again.
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for i in range(t):
+                self.step()
+                for obs in observers:
+                    obs.update(self)
+
+                # A regression coefficient is only meaningful once its distribution has at least two
+                # non-empty bins (a single point gives 0), earlier evaluations are not counted
+                if tol is not None and (i + 1) % every == 0 and \
+                        self.upvote_hist.n_nonempty() >= 2 and self.reputation_hist.n_nonempty() >= 2:
+                    # Coefficients are computed from the live histograms (O(bins))
+                    coeffs.append([self.get_regression_coeff(data='upvotes', binsize=self.upvote_hist.binsize),
+                                   self.get_regression_coeff(data='reputation', binsize=self.reputation_hist.binsize)])
+
+                    if len(coeffs) > window:
+                        change = np.abs(np.array(coeffs[-window - 1:]) - coeffs[-1])
+                        if np.max(change) < tol:
+                            self.converged_at = self.time
+                            break
+        except BaseException:
+            # The observers are stopped, but an error of an observer does not hide the error of the simulation
+            self.close(observers)
+            raise
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+        error = self.close(observers)
+        if error is not None:
+            raise error
+
+        return self.converged_at
+
+    def close(self, observers):
         """
-        for _ in range(t):
-            self.step()
+        Stop the observers and flush the recorder at the end of a run.
+
+        Every observer is stopped and the recorder is flushed, also if an observer fails
+        (e.g. a snapshot writer on a full disk).
+
+        Parameters
+        ----------
+        observers : list
+            observers of the run
+
+        Returns
+        -------
+        error : Exception
+            first error of an observer or the recorder (None if there was none)
+        """
+        error = None
+        for obs in observers:
+            try:
+                obs.stop(self)
+            except Exception as e:
+                if error is None:
+                    error = e
+
+        if self.recorder is not None:
+            try:
+                self.recorder.flush()
+            except Exception as e:
+                if error is None:
+                    error = e
+
+        return error
 
     def reset(self):
-        """Reset the system (does not change the parameter settings)."""
-        self.tags = [[] for _ in range(len(self.tag_cdf))]
+        """
+        Reset the system (does not change the parameter settings), the allocated storage is reused.
+
+        The users and questions are new lists, so a caller that holds a reference to the lists of
+        the previous run keeps them. The slots of the population are reused, so the users of the previous
+        run are detached from it: reading or writing their attributes raises a RuntimeError.
+        """
+        detached = population.released()
+        for user in self.users:
+            user.agents = detached
         self.users = []
+        self.agents.clear()
         self.questions = []
 
+        self.time = 0
+        self.n_questions = 0
+        self.n_answers = 0
+        self.n_upvotes = 0
+        self.reputation_total = 0
+        self.p_total = np.zeros(len(self.probabilities))
+        self.reputation_hist.clear()
+        self.upvote_hist.clear()
+        self.converged_at = None
+        self.pending = set()
+        self.visible = set()
+
+    def reserve(self, n_users):
+        """
+        Allocate the storage for a number of users at once (it is kept when the system is reset).
+
+        Parameters
+        ----------
+        n_users : int
+            number of users
+        """
+        self.agents.reserve(n_users)
+
+    def set_reputation(self, user, reputation):
+        """
+        Change the reputation of a user.
+
+        Parameters
+        ----------
+        user : .user.user
+            user of which the reputation changes
+        reputation : int
+            new reputation
+        """
+        previous = user.agents.reputation.item(user.slot)
+        self.reputation_total += reputation - previous
+        self.reputation_hist.move(previous, reputation)
+        user.agents.reputation[user.slot] = reputation
+
+        if self.recorder is not None:
+            self.recorder.record(self.time, 'reputation', user.id, -1, user.tag, reputation)
+
+    def count_upvote(self, user):
+        """
+        Register an upvote given by a user (after the counter of the user is increased).
+
+        Parameters
+        ----------
+        user : .user.user
+            user that gave the upvote
+        """
+        n_upvoted = user.agents.n_questions_upvoted.item(user.slot) + user.agents.n_answers_upvoted.item(user.slot)
+        self.n_upvotes += 1
+        self.upvote_hist.move(n_upvoted - 1, n_upvoted)
+
     def get_upvote_distr(self, binsize):
         """
         Get the distribution of upvotes given per user.
@@ -182,6 +479,10 @@ class network:
         bins : numpy.ndarray
             edges of the bins
         """
+        # Use the live histogram if the binsize matches
+        if binsize == self.upvote_hist.binsize:
+            return self.upvote_hist.get_distr()
+
         # Get the data on the upvotes
         upvotes = []
         for user in self.users:
@@ -212,6 +513,10 @@ class network:
         bins : numpy.ndarray
             edges of the bins
         """
+        # Use the live histogram if the binsize matches
+        if binsize == self.reputation_hist.binsize:
+            return self.reputation_hist.get_distr()
+
         # Get the data on reputation
         reputation = []
         for user in self.users:
@@ -0,0 +1,105 @@
+"""Module containing observers that collect data during a simulation of the model."""
+
+# Imports
+import numpy as np
+
+
+class collector:
+    """
+    Collects summary statistics of the network after every timestep.
+
+    The statistics are read from the counters that the network keeps up to date during the simulation,
+    so an update costs O(1) instead of a scan over all users and questions.
+
+    Attributes
+    ----------
+    metrics : list
+        names of the collected statistics (columns of data)
+    data : numpy.ndarray
+        value of every statistic (columns) after every timestep (rows)
+    n_steps : int
+        number of timesteps collected
+
+    Methods
+    -------
+    start(system, t)
+        Preallocate the storage for a run of t timesteps.
+    update(system)
+        Store the statistics of the current timestep.
+    stop(system)
+        Finish the run.
+    get(metric)
+        Get the time series of a statistic.
+    """
+
+    metrics = ['time', 'n_users', 'n_questions', 'n_answers', 'n_upvotes', 'mean_reputation',
+               'mean_p_ask', 'mean_p_answer', 'mean_p_interact', 'mean_p_active']
+
+    def __init__(self):
+        """Initialize a collector."""
+        self.data = np.zeros((0, len(self.metrics)))
+        self.n_steps = 0
+
+    def start(self, system, t):
+        """
+        Preallocate the storage for a run of t timesteps.
+
+        Parameters
+        ----------
+        system : model.network
+            model that is simulated
+        t : int
+            number of timesteps of the run
+        """
+        # Extend the storage if the collector is used for consecutive runs
+        self.data = np.concatenate((self.data[:self.n_steps], np.zeros((t, len(self.metrics)))))
+
+    def update(self, system):
+        """
+        Store the statistics of the current timestep.
+
+        Parameters
+        ----------
+        system : model.network
+            model that is simulated
+        """
+        n_users = len(system.users)
+
+        row = self.data[self.n_steps]
+        row[0] = system.time
+        row[1] = n_users
+        row[2] = system.n_questions
+        row[3] = system.n_answers
+        row[4] = system.n_upvotes
+        if n_users:
+            row[5] = system.reputation_total / n_users
+            row[6:] = system.p_total / n_users
+
+        self.n_steps += 1
+
+    def stop(self, system):
+        """
+        Finish the run (the statistics are already stored).
+
+        Parameters
+        ----------
+        system : model.network
+            model that is simulated
+        """
+        pass
+
+    def get(self, metric):
+        """
+        Get the time series of a statistic.
+
+        Parameters
+        ----------
+        metric : str
+            name of the statistic
+
+        Returns
+        -------
+        series : numpy.ndarray
+            value of the statistic after every timestep
+        """
+        return self.data[:self.n_steps, self.metrics.index(metric)]
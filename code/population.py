@@ -0,0 +1,222 @@
+"""Compact storage of the state of all users (one array per attribute)."""
+
+# Imports
+import numpy as np
+
+# Attributes of a user and their type
+fields = {'id': np.int32,
+          'tag': np.int16,
+          'reputation': np.int32,
+          'upvote_bias': np.int16,
+          'p_ask': np.float32,
+          'p_answer': np.float32,
+          'p_interact': np.float32,
+          'p_active': np.float32,
+          'p_ask_begin': np.float32,
+          'p_answer_begin': np.float32,
+          'p_interact_begin': np.float32,
+          'p_active_begin': np.float32,
+          'n_questions_asked': np.int32,
+          'n_questions_answered': np.int32,
+          'n_questions_upvoted': np.int32,
+          'n_answers_upvoted': np.int32}
+
+# Range of the stored probabilities: values closer to 1 than the float32 resolution near 1 (2^-24)
+# or smaller than the smallest normal float32 would be rounded to exactly 1 or 0 (infinite logit)
+p_min = float(np.finfo(np.float32).tiny)
+p_max = 1 - 2.0**-24
+
+
+class population:
+    """
+    Arrays with the attributes of all users, the user objects are views on a slot of these arrays.
+
+    Attributes
+    ----------
+    size : int
+        number of slots in use
+    capacity : int
+        number of slots that fit in the arrays
+    id, tag, reputation, ... : numpy.ndarray
+        value of the attribute for every slot (see fields), the tag is -1 until it is set (see set_tag)
+    tag_index : list
+        for every tag, array with the slots of the users with that tag (in the order in which the tag was set)
+    tag_count : list
+        number of slots in use in the array of every tag
+
+    Methods
+    -------
+    allocate()
+        Reserve a slot for a new user.
+    set_tag(slot, tag)
+        Change the tag of a slot.
+    with_tag(tag)
+        Slots of the users with a tag.
+    reserve(capacity)
+        Make sure that the arrays can hold a number of users without growing.
+    clear()
+        Remove all users.
+    nbytes()
+        Memory used by the arrays.
+    """
+
+    def __init__(self, capacity=1024):
+        """
+        Initialize an empty population.
+
+        Parameters
+        ----------
+        capacity : int
+            initial number of slots, default is 1024
+        """
+        self.size = 0
+        self.capacity = capacity
+        for name, dtype in fields.items():
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+
+        # Members of every tag, so the users of a tag are found without visiting all users
+        self.tag_index = []
+        self.tag_count = []
+
+    def allocate(self):
+        """
+        Reserve a slot for a new user (all attributes are zero).
+
+        Returns
+        -------
+        slot : int
+            index of the slot
+        """
+        if self.size == self.capacity:
+            # The arrays grow by doubling
+            for name in fields:
+                array = getattr(self, name)
+                setattr(self, name, np.concatenate((array, np.zeros_like(array))))
+            self.capacity *= 2
+
+        slot = self.size
+        self.size += 1
+        self.tag[slot] = -1
+
+        return slot
+
+    def set_tag(self, slot, tag):
+        """
+        Change the tag of a slot (the index of the members of every tag is kept up to date).
+
+        Parameters
+        ----------
+        slot : int
+            index of the slot
+        tag : int
+            new tag
+        """
+        previous = self.tag.item(slot)
+        if previous >= 0:
+            # Remove the slot from the members of its previous tag (rare, e.g. in tests)
+            members = self.tag_index[previous]
+            n = self.tag_count[previous]
+            i = np.flatnonzero(members[:n] == slot)[0]
+            members[i:n - 1] = members[i + 1:n]
+            self.tag_count[previous] -= 1
+
+        while tag >= len(self.tag_index):
+            self.tag_index.append(np.zeros(16, dtype=np.int32))
+            self.tag_count.append(0)
+
+        # The arrays of the members grow by doubling
+        if self.tag_count[tag] == len(self.tag_index[tag]):
+            self.tag_index[tag] = np.concatenate((self.tag_index[tag], np.zeros_like(self.tag_index[tag])))
+        self.tag_index[tag][self.tag_count[tag]] = slot
+        self.tag_count[tag] += 1
+        self.tag[slot] = tag
+
+    def with_tag(self, tag):
+        """
+        Slots of the users with a tag.
+
+        Parameters
+        ----------
+        tag : int
+            tag
+
+        Returns
+        -------
+        slots : numpy.ndarray
+            slots of the members of the tag (a view, valid until the next change of a tag)
+        """
+        if tag >= len(self.tag_index):
+            return np.zeros(0, dtype=np.int32)
+
+        return self.tag_index[tag][:self.tag_count[tag]]
+
+    def reserve(self, capacity):
+        """
+        Make sure that the arrays can hold a number of users without growing.
+
+        Parameters
+        ----------
+        capacity : int
+            number of slots
+        """
+        if capacity > self.capacity:
+            for name in fields:
+                array = getattr(self, name)
+                setattr(self, name, np.concatenate((array, np.zeros(capacity - self.capacity, dtype=array.dtype))))
+            self.capacity = capacity
+
+    def clear(self):
+        """Remove all users (the slots are reused)."""
+        for name in fields:
+            getattr(self, name)[:self.size] = 0
+        self.tag_count = [0] * len(self.tag_count)
+        self.size = 0
+
+    def nbytes(self):
+        """
+        Memory used by the arrays.
+
+        Returns
+        -------
+        nbytes : int
+            number of bytes of all arrays
+        """
+        return sum([getattr(self, name).nbytes for name in fields]) + sum([members.nbytes for members in self.tag_index])
+
+
+class released:
+    """Storage of the users of a run that was reset (the slots are reused), every access raises an error."""
+
+    __slots__ = ()
+
+    def __getattr__(self, name):
+        raise RuntimeError('The user belongs to a run that was reset, its slot is reused by another user')
+
+
+def field(name, cast, bounds=None):
+    """
+    Attribute of a user that is stored in the population.
+
+    Parameters
+    ----------
+    name : str
+        name of the attribute (see fields)
+    cast : type
+        python type of the value (int or float)
+    bounds : tuple
+        (lower, upper) limit to which the value is clipped when it is written, default is None (no limit)
+
+    Returns
+    -------
+    attribute : property
+        reads and writes the slot of the user
+    """
+    def get(self):
+        return cast(getattr(self.agents, name)[self.slot])
+
+    def set(self, value):
+        if bounds is not None:
+            value = min(max(value, bounds[0]), bounds[1])
+        getattr(self.agents, name)[self.slot] = value
+
+    return property(get, set)
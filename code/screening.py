@@ -0,0 +1,111 @@
+"""Morris screening of all parameters followed by the global sensitivity analysis (Sobol) of the influential ones."""
+
+# Imports
+import numpy as np
+from SALib.analyze import morris
+from SALib.sample import morris as morris_sample
+from SALib.sample import saltelli
+
+from store import save_results
+from sweep import outputs, run_design
+
+# All tunable parameters of the model
+variables = {
+    'num_vars' : 10,
+    'names': ['treshold', 'bias', 'mu_p_ask', 'std_p_ask', 'mu_p_answer', 'std_p_answer',
+              'mu_p_upvote', 'std_p_upvote', 'mu_p_active', 'std_p_active'],
+    'bounds': [[0, 40], [1, 40], [0, 1], [0.01, 1], [0, 1], [0.01, 1], [0, 1], [0.01, 1], [0, 1], [0.01, 1]]}
+
+# Number of Morris trajectories ((num_vars + 1) model runs each) and levels of the grid
+n_trajectories = 20
+num_levels = 4
+# Parameters with mu* below this fraction of the largest mu* (for every output) are dropped
+cutoff = 0.1
+# Saltelli sample size of the Sobol stage
+n_samples = 512
+
+
+def screen(problem, X, Y, cutoff=cutoff, names=outputs):
+    """
+    Determine the influential parameters with the Morris elementary effects method.
+
+    Parameters
+    ----------
+    problem : dict
+        definition of the variables (SALib format)
+    X : numpy.ndarray
+        Morris sample points
+    Y : numpy.ndarray (len(X) x len(names))
+        outputs of the model
+    cutoff : float
+        parameters with mu* below cutoff times the largest mu* for every output are dropped, default is cutoff
+    names : list
+        names of the outputs, default is sweep.outputs
+
+    Returns
+    -------
+    keep : list
+        names of the influential parameters (same order as in problem)
+    Si : dict
+        result of SALib.analyze.morris.analyze for every output
+    """
+    Y = np.array(Y, dtype=float).reshape(len(X), -1)
+    influential = np.zeros(problem['num_vars'], dtype=bool)
+
+    Si = {}
+    for i, name in enumerate(names):
+        Si[name] = morris.analyze(problem, X, Y[:, i], num_levels=num_levels)
+        mu_star = np.array(Si[name]['mu_star'])
+        influential |= mu_star >= cutoff * np.max(mu_star)
+
+    keep = [param for param, flag in zip(problem['names'], influential) if flag]
+
+    return keep, Si
+
+
+def reduce_problem(problem, keep):
+    """
+    Definition of the variables without the non-influential parameters.
+
+    Parameters
+    ----------
+    problem : dict
+        definition of the variables (SALib format)
+    keep : list
+        names of the parameters that are kept
+
+    Returns
+    -------
+    reduced : dict
+        definition of the kept variables (SALib format)
+    """
+    indices = [problem['names'].index(param) for param in keep]
+
+    return {'num_vars': len(keep),
+            'names': list(keep),
+            'bounds': [problem['bounds'][i] for i in indices]}
+
+
+if __name__ == '__main__':
+    # Screening stage
+    X = morris_sample.sample(variables, n_trajectories, num_levels=num_levels, seed=0)
+    Y = run_design(variables, X)
+    keep, Si = screen(variables, X, Y)
+
+    for name in outputs:
+        print(name, dict(zip(variables['names'], np.round(Si[name]['mu_star'], 3))))
+    print('Influential parameters:', keep)
+
+    # Sobol stage on the influential parameters (the others keep their default value)
+    reduced = reduce_problem(variables, keep)
+    X = saltelli.sample(reduced, n_samples, calc_second_order=False)
+    Y = run_design(reduced, X)
+
+    # One row per sample point (same columnar store as the other sweeps)
+    data = {'sample': np.arange(len(X))}
+    for i, name in enumerate(reduced['names']):
+        data[name] = X[:, i]
+    for i, output in enumerate(outputs):
+        data[output] = Y[:, i]
+
+    save_results('global_sa_screened.npz', data)
@@ -0,0 +1,560 @@
+"""Local sweep service: a long-lived server that runs the sweeps of several users on one shared pool of workers."""
+
+# Imports
+import asyncio
+import collections
+import concurrent.futures
+import functools
+import json
+import os
+
+import numpy as np
+
+import cache as caching
+import meanfield
+import sweep
+from model import network
+
+# Default address of the service (a path is used as unix socket)
+address = ('localhost', 8765)
+
+# Models that can be run by the service
+engines = {'network': network, 'meanfield': meanfield.meanfield}
+
+# Cache of the seeded runs of a worker (set by init_worker)
+worker_cache = None
+
+
+def init_worker(directory=None):
+    """
+    Prepare a worker process of the pool (the model is imported once per worker).
+
+    Parameters
+    ----------
+    directory : str
+        directory of the run cache that is used for seeded runs, default is None (no cache)
+    """
+    global worker_cache
+
+    # Forked workers inherit the state of the random number generator, unseeded runs have to differ
+    np.random.seed()
+    worker_cache = None if directory is None else caching.run_cache(directory)
+
+
+def run_task(setting, names, t, n, engine, seed):
+    """
+    Run a single replicate of a sample point (executed by a worker).
+
+    Parameters
+    ----------
+    setting : list
+        value of every variable
+    names : list
+        names of the variables
+    t : int
+        number of timesteps
+    n : int
+        number of users added every timestep
+    engine : str
+        name of the model (see engines)
+    seed : int
+        seed of the random number generator (None for an unseeded run)
+
+    Returns
+    -------
+    y : list
+        value of every output parameter (same order as sweep.outputs)
+    """
+    y = sweep.evaluate(setting, names, t, n, engines[engine], seed, worker_cache)
+
+    return [float(value) for value in y]
+
+
+def is_integer(value):
+    """
+    Check if a value of a request is an integer (booleans are not accepted).
+
+    Parameters
+    ----------
+    value : object
+        value decoded from json
+
+    Returns
+    -------
+    integer : bool
+        True if the value is an integer
+    """
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+class job:
+    """
+    Parameter sweep submitted to the service.
+
+    Attributes
+    ----------
+    id : int
+        number of the job
+    names : list
+        names of the variables
+    settings : list
+        sample points (value of every variable)
+    runs : int
+        number of replicates of every sample point
+    t : int
+        number of timesteps of a run
+    n : int
+        number of users added every timestep
+    engine : str
+        name of the model (see engines)
+    seed : int
+        seed of the first replicate (replicate i uses seed + i), None for unseeded runs
+    pending : collections.deque
+        tasks (sample, replicate) that still have to be started
+    Y : list
+        outputs of every run (sample x replicate x output)
+    done : int
+        number of finished runs
+    error : str
+        description of the error if a run failed (None otherwise)
+    messages : asyncio.Queue
+        messages (progress, result or error) that have to be sent to the client
+    """
+
+    def __init__(self, id, request):
+        """
+        Initialize a job from the request of a client.
+
+        Parameters
+        ----------
+        id : int
+            number of the job
+        request : dict
+            names, settings and optionally runs (1), t (20), n (150), engine ('network') and seed (None)
+        """
+        self.id = id
+        self.names = request['names']
+        self.settings = request['settings']
+        self.runs = request.get('runs', 1)
+        self.t = request.get('t', 20)
+        self.n = request.get('n', 150)
+        self.engine = request.get('engine', 'network')
+        self.seed = request.get('seed')
+
+        # The request comes from a client, every field is checked before the job is queued
+        if not isinstance(self.names, list) or not all([isinstance(name, str) for name in self.names]):
+            raise ValueError('names has to be a list of strings')
+        if not isinstance(self.settings, list):
+            raise ValueError('settings has to be a list')
+        for setting in self.settings:
+            if not isinstance(setting, list) or len(setting) != len(self.names):
+                raise ValueError('Every setting needs a value for every variable')
+            if not all([is_integer(value) or isinstance(value, float) for value in setting]):
+                raise ValueError('The values of a setting have to be numbers')
+        for name in ['runs', 't', 'n']:
+            if not is_integer(getattr(self, name)) or getattr(self, name) < 1:
+                raise ValueError('%s has to be a positive integer' %name)
+        if self.seed is not None and not is_integer(self.seed):
+            raise ValueError('seed has to be an integer or null')
+        if self.engine not in engines:
+            raise ValueError('Unknown engine given (%s)' %self.engine)
+
+        self.pending = collections.deque([(i, r) for r in range(self.runs) for i in range(len(self.settings))])
+        self.Y = [[None] * self.runs for _ in self.settings]
+        self.done = 0
+        self.error = None
+        self.messages = asyncio.Queue()
+
+    def total(self):
+        """Number of runs of the job."""
+        return len(self.settings) * self.runs
+
+
+class service:
+    """
+    Server that queues the jobs of all clients and runs them on a shared pool of worker processes.
+
+    The jobs are served round-robin (one run at a time), so a large sweep does not block the others
+    and never more runs are started than there are workers.
+    Protocol: one json object per line, a client sends {"type": "submit", ...} (see job) or {"type": "status"}
+    and receives "accepted", "progress" messages and finally a "result" (or "error") message.
+
+    Attributes
+    ----------
+    processes : int
+        number of worker processes
+    cache : str
+        directory of the run cache of the workers (None if not used)
+    active : collections.deque
+        jobs with tasks that still have to be started
+    busy : int
+        number of runs that are executed
+    n_jobs : int
+        number of jobs that were submitted
+    executor : concurrent.futures.ProcessPoolExecutor
+        persistent worker processes (created by serve, replaced if a worker dies)
+    ready : asyncio.Condition
+        notified when a job is queued
+    free : asyncio.Semaphore
+        number of idle workers
+
+    Methods
+    -------
+    serve(address)
+        Run the service until it is cancelled.
+    handle(reader, writer)
+        Serve the requests of a single client.
+    dispatch()
+        Start the tasks of the queued jobs on the workers.
+    start_workers()
+        Create the pool of workers.
+    restart(executor)
+        Replace a broken pool of workers.
+    status()
+        Summary of the state of the service.
+    """
+
+    def __init__(self, processes=None, cache=None):
+        """
+        Initialize the service.
+
+        Parameters
+        ----------
+        processes : int
+            number of worker processes, default is None (number of cpus)
+        cache : str
+            directory of the run cache used for seeded runs, default is None (no cache)
+        """
+        self.processes = processes or os.cpu_count()
+        self.cache = cache
+        self.active = collections.deque()
+        self.busy = 0
+        self.n_jobs = 0
+
+    async def serve(self, address=address, started=None):
+        """
+        Run the service until it is cancelled.
+
+        Parameters
+        ----------
+        address : tuple or str
+            (host, port) or path of a unix socket, default is service.address
+        started : asyncio.Event
+            set once the service accepts connections, default is None
+        """
+        self.ready = asyncio.Condition()
+        self.free = asyncio.Semaphore(self.processes)
+
+        self.start_workers()
+        try:
+            if isinstance(address, str):
+                server = await asyncio.start_unix_server(self.handle, address)
+            else:
+                server = await asyncio.start_server(self.handle, *address)
+
+            dispatcher = asyncio.create_task(self.dispatch())
+            if started is not None:
+                started.set()
+            try:
+                async with server:
+                    await server.serve_forever()
+            finally:
+                dispatcher.cancel()
+        finally:
+            self.executor.shutdown()
+
+    async def handle(self, reader, writer):
+        """
+        Serve the requests of a single client.
+
+        Parameters
+        ----------
+        reader : asyncio.StreamReader
+            incoming messages
+        writer : asyncio.StreamWriter
+            outgoing messages
+        """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError('Request is not a json object')
+                    if request.get('type') == 'status':
+                        await send(writer, self.status())
+                    elif request.get('type') == 'submit':
+                        await self.run_job(job(self.n_jobs, request), writer)
+                    else:
+                        raise ValueError('Unknown request')
+                except (ValueError, KeyError, TypeError) as error:
+                    await send(writer, {'type': 'error', 'message': str(error)})
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def run_job(self, new, writer):
+        """
+        Queue a job and stream its progress to the client.
+
+        Parameters
+        ----------
+        new : .job
+            job of the client
+        writer : asyncio.StreamWriter
+            outgoing messages
+        """
+        self.n_jobs += 1
+        async with self.ready:
+            if new.pending:
+                self.active.append(new)
+                self.ready.notify()
+            else:
+                new.messages.put_nowait({'type': 'result', 'job': new.id, 'Y': new.Y})
+        await send(writer, {'type': 'accepted', 'job': new.id, 'total': new.total()})
+
+        try:
+            while True:
+                message = await new.messages.get()
+                await send(writer, message)
+                if message['type'] != 'progress':
+                    break
+        except ConnectionError:
+            # Client is gone, the runs that were not started yet are dropped
+            self.cancel(new, 'client disconnected')
+
+    async def dispatch(self):
+        """Start the tasks of the queued jobs on the workers (one task per free worker)."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.free.acquire()
+            async with self.ready:
+                await self.ready.wait_for(lambda: self.active)
+
+                # Round-robin over the jobs
+                current = self.active.popleft()
+                i, r = current.pending.popleft()
+                if current.pending:
+                    self.active.append(current)
+
+            executor = self.executor
+            try:
+                seed = None if current.seed is None else current.seed + r
+                future = loop.run_in_executor(executor, run_task, current.settings[i], current.names,
+                                              current.t, current.n, current.engine, seed)
+            except concurrent.futures.BrokenExecutor:
+                # A worker died, the task is started again on a new pool
+                self.free.release()
+                self.restart(executor)
+                if current.error is None:
+                    async with self.ready:
+                        current.pending.appendleft((i, r))
+                        if current not in self.active:
+                            self.active.appendleft(current)
+                continue
+            except Exception as error:
+                # Only this job fails, the dispatcher keeps serving the others
+                self.free.release()
+                if current.error is None:
+                    self.cancel(current, repr(error))
+                    current.messages.put_nowait({'type': 'error', 'job': current.id, 'message': current.error})
+                continue
+
+            self.busy += 1
+            future.add_done_callback(functools.partial(self.finish, current, i, r, executor))
+
+    def start_workers(self):
+        """Create the pool of workers."""
+        self.executor = concurrent.futures.ProcessPoolExecutor(self.processes, initializer=init_worker,
+                                                               initargs=(self.cache,))
+
+    def restart(self, executor):
+        """
+        Replace a broken pool of workers (e.g. a worker was killed), without it every later task would fail.
+
+        Parameters
+        ----------
+        executor : concurrent.futures.ProcessPoolExecutor
+            pool that is broken (nothing happens if it was already replaced)
+        """
+        if executor is self.executor:
+            executor.shutdown(wait=False)
+            self.start_workers()
+
+    def finish(self, current, i, r, executor, future):
+        """
+        Store the outcome of a run and notify the client of the job.
+
+        Parameters
+        ----------
+        current : .job
+            job to which the run belongs
+        i : int
+            index of the sample point
+        r : int
+            replicate
+        executor : concurrent.futures.ProcessPoolExecutor
+            pool on which the run was executed
+        future : asyncio.Future
+            finished run
+        """
+        self.busy -= 1
+        self.free.release()
+        if isinstance(future.exception(), concurrent.futures.BrokenExecutor):
+            # The runs in progress are lost (the job fails), later tasks use a new pool
+            self.restart(executor)
+        if current.error is not None:
+            return
+
+        if future.exception() is not None:
+            self.cancel(current, repr(future.exception()))
+            current.messages.put_nowait({'type': 'error', 'job': current.id, 'message': current.error})
+            return
+
+        current.Y[i][r] = future.result()
+        current.done += 1
+        current.messages.put_nowait({'type': 'progress', 'job': current.id, 'done': current.done, 'total': current.total()})
+        if current.done == current.total():
+            current.messages.put_nowait({'type': 'result', 'job': current.id, 'Y': current.Y})
+
+    def cancel(self, current, reason):
+        """
+        Stop a job (runs that are already executed are finished, but ignored).
+
+        Parameters
+        ----------
+        current : .job
+            job that is stopped
+        reason : str
+            description of the reason
+        """
+        current.error = reason
+        current.pending.clear()
+        if current in self.active:
+            self.active.remove(current)
+
+    def status(self):
+        """
+        Summary of the state of the service.
+
+        Returns
+        -------
+        status : dict
+            number of workers, number of runs in progress and the progress of the queued jobs
+        """
+        return {'type': 'status', 'workers': self.processes, 'busy': self.busy,
+                'jobs': [{'job': queued.id, 'done': queued.done, 'total': queued.total()} for queued in self.active]}
+
+
+async def send(writer, message):
+    """
+    Write a single message to a client.
+
+    Parameters
+    ----------
+    writer : asyncio.StreamWriter
+        outgoing messages
+    message : dict
+        message (json)
+    """
+    writer.write((json.dumps(message) + '\n').encode())
+    await writer.drain()
+
+
+async def connect(address):
+    """
+    Open a connection to the service.
+
+    Parameters
+    ----------
+    address : tuple or str
+        (host, port) or path of a unix socket
+
+    Returns
+    -------
+    reader, writer : asyncio.StreamReader, asyncio.StreamWriter
+        connection
+    """
+    if isinstance(address, str):
+        return await asyncio.open_unix_connection(address)
+
+    return await asyncio.open_connection(*address)
+
+
+async def request(names, settings, runs=1, t=20, n=150, engine='network', seed=None, address=address, progress=None):
+    """
+    Submit a sweep to the service and wait for the outcome.
+
+    Parameters
+    ----------
+    names : list
+        names of the variables
+    settings : numpy.ndarray
+        sample points (value of every variable)
+    runs : int
+        number of replicates of every sample point, default is 1
+    t : int
+        number of timesteps, default is 20
+    n : int
+        number of users added every timestep, default is 150
+    engine : str
+        name of the model (see engines), default is network
+    seed : int
+        seed of the first replicate (replicate i uses seed + i), default is None (not seeded)
+    address : tuple or str
+        address of the service, default is service.address
+    progress : callable
+        called with the number of finished runs and the total number of runs, default is None
+
+    Returns
+    -------
+    Y : numpy.ndarray (len(settings) x runs x len(sweep.outputs))
+        outputs of every run
+    """
+    reader, writer = await connect(address)
+    try:
+        await send(writer, {'type': 'submit', 'names': list(names), 'settings': np.asarray(settings, dtype=float).tolist(),
+                            'runs': int(runs), 't': int(t), 'n': int(n), 'engine': engine,
+                            'seed': None if seed is None else int(seed)})
+        while True:
+            line = await reader.readline()
+            if not line:
+                raise ConnectionError('Connection to the sweep service was closed')
+
+            message = json.loads(line)
+            if message['type'] == 'progress' and progress is not None:
+                progress(message['done'], message['total'])
+            elif message['type'] == 'result':
+                return np.array(message['Y'], dtype=float).reshape(len(settings), runs, len(sweep.outputs))
+            elif message['type'] == 'error':
+                raise RuntimeError('Sweep failed (%s)' %message['message'])
+    finally:
+        writer.close()
+
+
+def submit(names, settings, runs=1, t=20, n=150, engine='network', seed=None, address=address, progress=None):
+    """
+    Submit a sweep to the service and wait for the outcome (blocking version of request).
+
+    Parameters
+    ----------
+    See request.
+
+    Returns
+    -------
+    Y : numpy.ndarray (len(settings) x runs x len(sweep.outputs))
+        outputs of every run
+    """
+    return asyncio.run(request(names, settings, runs, t, n, engine, seed, address, progress))
+
+
+if __name__ == '__main__':
+    # Number of workers shared by all users of the machine and the directory of the run cache
+    processes = None
+    cache = None
+
+    asyncio.run(service(processes, cache).serve(address))
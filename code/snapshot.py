@@ -0,0 +1,301 @@
+"""Module to write periodic snapshots of the state of all users to disk during a run (and read them back)."""
+
+# Imports
+import os
+import queue
+import threading
+
+import numpy as np
+
+import population
+
+# Attributes of a user that are stored in a snapshot (one record per user)
+snapshot_dtype = np.dtype([(name, population.fields[name]) for name in
+                           ['id', 'tag', 'reputation', 'p_ask', 'p_answer', 'p_interact', 'p_active',
+                            'n_questions_asked', 'n_questions_answered', 'n_questions_upvoted', 'n_answers_upvoted']])
+
+# Entry of the index file (one per snapshot, written after the data of the snapshot)
+index_dtype = np.dtype([('step', np.int32), ('n_users', np.int32), ('offset', np.int64)])
+
+
+class writer:
+    """
+    Observer that appends a snapshot of the users to a file every few timesteps.
+
+    The simulation only copies the arrays of the population to one of two buffers, a background
+    thread writes the other one to disk (double buffering). The data file is append-only and a
+    snapshot is added to the index (filename.idx) once its data is written, so after a crash the
+    file still contains all complete snapshots.
+
+    Attributes
+    ----------
+    filename : str
+        data file (index is filename.idx)
+    every : int
+        number of timesteps between two snapshots
+    buffers : list
+        two structured arrays (snapshot_dtype) that are filled in turn
+    n_snapshots : int
+        number of snapshots written to disk
+    last_step : int
+        timestep of the last snapshot (None if there is none)
+
+    Methods
+    -------
+    start(system, t)
+        Start the background thread and allocate the buffers.
+    update(system)
+        Take a snapshot if the timestep is a multiple of every.
+    stop(system)
+        Take a snapshot of the final state and wait until everything is written.
+    save(system)
+        Take a snapshot.
+    recover()
+        Remove an incomplete snapshot from the end of the files.
+    """
+
+    def __init__(self, filename, every=10, append=False):
+        """
+        Initialize a writer.
+
+        Parameters
+        ----------
+        filename : str
+            data file (the index is written to filename.idx)
+        every : int
+            number of timesteps between two snapshots, default is 10
+        append : bool
+            if True, snapshots are added to existing files, default is False (files are overwritten)
+        """
+        self.filename = filename
+        self.every = every
+        self.buffers = [np.zeros(0, dtype=snapshot_dtype), np.zeros(0, dtype=snapshot_dtype)]
+        self.n_snapshots = 0
+        self.last_step = None
+
+        # Buffers that can be filled and snapshots that have to be written
+        self.free = queue.Queue()
+        self.pending = queue.Queue()
+        for i in range(len(self.buffers)):
+            self.free.put(i)
+        self.thread = None
+        self.error = None
+
+        if not append or not os.path.exists(filename + '.idx'):
+            open(filename, 'wb').close()
+            open(filename + '.idx', 'wb').close()
+        else:
+            self.recover()
+
+    def recover(self):
+        """Remove an incomplete snapshot (crash while writing) from the end of the files before appending."""
+        count = os.path.getsize(self.filename + '.idx') // index_dtype.itemsize
+        with open(self.filename + '.idx', 'r+b') as index:
+            index.truncate(count * index_dtype.itemsize)
+
+        end = 0
+        if count > 0:
+            step, n_users, offset = np.fromfile(self.filename + '.idx', dtype=index_dtype, count=count)[-1]
+            end = int(offset) + int(n_users) * snapshot_dtype.itemsize
+        with open(self.filename, 'ab') as data:
+            data.truncate(min(end, data.tell()))
+
+    def start(self, system, t):
+        """
+        Start the background thread and allocate the buffers.
+
+        Parameters
+        ----------
+        system : model.network
+            model that is simulated
+        t : int
+            number of timesteps of the run
+        """
+        # An error of a previous run is not carried over
+        self.error = None
+
+        # The population is already reserved for the whole run
+        for i, buffer in enumerate(self.buffers):
+            if len(buffer) < system.agents.capacity:
+                self.buffers[i] = np.zeros(system.agents.capacity, dtype=snapshot_dtype)
+
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.write, daemon=True)
+            self.thread.start()
+
+    def update(self, system):
+        """
+        Take a snapshot if the timestep is a multiple of every.
+
+        Parameters
+        ----------
+        system : model.network
+            model that is simulated
+        """
+        if system.time % self.every == 0:
+            self.save(system)
+
+    def stop(self, system):
+        """
+        Take a snapshot of the final state and wait until everything is written.
+
+        Parameters
+        ----------
+        system : model.network
+            model that is simulated
+
+        Raises
+        ------
+        Exception
+            the error of the background thread if a snapshot could not be written
+        """
+        if self.thread is None:
+            return
+
+        try:
+            if self.last_step != system.time:
+                self.save(system)
+        finally:
+            self.pending.put(None)
+            self.thread.join()
+            self.thread = None
+            self.last_step = None
+
+        if self.error is not None:
+            raise self.error
+
+    def save(self, system):
+        """
+        Take a snapshot (only waits if both buffers are still being written).
+
+        Parameters
+        ----------
+        system : model.network
+            model that is simulated
+        """
+        i = self.free.get()
+
+        n_users = system.agents.size
+        if len(self.buffers[i]) < n_users:
+            self.buffers[i] = np.zeros(system.agents.capacity, dtype=snapshot_dtype)
+
+        buffer = self.buffers[i][:n_users]
+        for name in snapshot_dtype.names:
+            buffer[name] = getattr(system.agents, name)[:n_users]
+
+        self.last_step = system.time
+        self.pending.put((i, system.time, n_users))
+
+    def write(self):
+        """Write the filled buffers to disk (executed by the background thread)."""
+        data = index = None
+        try:
+            data = open(self.filename, 'ab')
+            index = open(self.filename + '.idx', 'ab')
+        except Exception as error:
+            self.error = error
+
+        try:
+            while True:
+                item = self.pending.get()
+                if item is None:
+                    break
+
+                i, step, n_users = item
+                try:
+                    if self.error is None:
+                        offset = data.tell()
+                        self.buffers[i][:n_users].tofile(data)
+                        data.flush()
+                        np.array([(step, n_users, offset)], dtype=index_dtype).tofile(index)
+                        index.flush()
+                        self.n_snapshots += 1
+                except Exception as error:
+                    # Reported by stop, the thread keeps releasing the buffers so the simulation is not blocked
+                    self.error = error
+                finally:
+                    self.free.put(i)
+        finally:
+            for f in [data, index]:
+                if f is not None:
+                    f.close()
+
+
+class reader:
+    """
+    Random access to the snapshots of a run (memory-mapped).
+
+    Attributes
+    ----------
+    filename : str
+        data file
+    index : numpy.ndarray
+        step, number of users and offset of every complete snapshot (index_dtype)
+    steps : numpy.ndarray
+        timestep of every snapshot
+
+    Methods
+    -------
+    get(step)
+        State of the users at a timestep.
+    """
+
+    def __init__(self, filename):
+        """
+        Open the snapshots of a run.
+
+        Parameters
+        ----------
+        filename : str
+            data file written by a writer
+        """
+        self.filename = filename
+
+        # An incomplete entry at the end (crash while writing) is ignored
+        count = os.path.getsize(filename + '.idx') // index_dtype.itemsize
+        self.index = np.fromfile(filename + '.idx', dtype=index_dtype, count=count)
+        self.steps = self.index['step']
+
+    def __len__(self):
+        """Number of snapshots."""
+        return len(self.index)
+
+    def __getitem__(self, i):
+        """
+        State of the users in a snapshot.
+
+        Parameters
+        ----------
+        i : int
+            number of the snapshot
+
+        Returns
+        -------
+        users : numpy.ndarray
+            one record per user (snapshot_dtype), the data is only read from disk when it is accessed
+        """
+        step, n_users, offset = self.index[i]
+        if n_users == 0:
+            return np.zeros(0, dtype=snapshot_dtype)
+
+        return np.memmap(self.filename, dtype=snapshot_dtype, mode='r', offset=int(offset), shape=(int(n_users),))
+
+    def get(self, step):
+        """
+        State of the users at a timestep (the last snapshot of that timestep if runs were appended).
+
+        Parameters
+        ----------
+        step : int
+            timestep
+
+        Returns
+        -------
+        users : numpy.ndarray
+            one record per user (snapshot_dtype)
+        """
+        matches = np.flatnonzero(self.steps == step)
+        if len(matches) == 0:
+            raise KeyError('No snapshot of timestep %d' %step)
+
+        return self[matches[-1]]
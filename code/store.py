@@ -0,0 +1,206 @@
+"""Module to store the results of the sensitivity analysis in a tidy columnar file (npz)."""
+
+# Imports
+import ast
+import numpy as np
+import pandas as pd
+
+
+def save_results(filename, columns):
+    """
+    Write results to a columnar file.
+
+    Parameters
+    ----------
+    filename : str
+        name of the .npz file
+    columns : dict or pandas.DataFrame
+        columns of equal length (one row per run)
+    """
+    arrays = {}
+    for name in columns:
+        column = np.asarray(columns[name])
+        if column.dtype == object:
+            # Mixed columns (e.g. from a dataframe) are stored as numbers if possible
+            try:
+                column = column.astype(float)
+            except (TypeError, ValueError):
+                column = column.astype(str)
+        arrays[name] = column
+
+    np.savez(filename, **arrays)
+
+
+def load_results(filename, as_frame=True):
+    """
+    Read results from a columnar file.
+
+    Parameters
+    ----------
+    filename : str
+        name of the .npz file
+    as_frame : bool
+        return a dataframe if True, otherwise a dictionary of arrays, default is True
+
+    Returns
+    -------
+    results : pandas.DataFrame or dict
+        columns of the results
+    """
+    with np.load(filename, allow_pickle=False) as data:
+        columns = {name: data[name] for name in data.files}
+
+    return pd.DataFrame(columns) if as_frame else columns
+
+
+def merge_results(filenames, filename):
+    """
+    Merge several result files into a single file.
+
+    Parameters
+    ----------
+    filenames : list
+        names of the .npz files to merge (same columns)
+    filename : str
+        name of the merged .npz file
+    """
+    parts = [load_results(f, as_frame=False) for f in filenames]
+    save_results(filename, {name: np.concatenate([part[name] for part in parts]) for name in parts[0]})
+
+
+def ofat_records(var, values, data):
+    """
+    Convert the results of a one-factor-at-a-time sweep to the long format.
+
+    Parameters
+    ----------
+    var : str
+        name of the variable
+    values : list
+        values of the variable
+    data : list
+        for every value, a dictionary with the outcomes of the replicates for every output parameter
+
+    Returns
+    -------
+    columns : dict
+        columns variable, value, replicate and one column per output (one row per replicate)
+    """
+    columns = {'variable': [], 'value': [], 'replicate': []}
+    for value, results in zip(values, data):
+        runs = len(next(iter(results.values())))
+        columns['variable'] += [var] * runs
+        columns['value'] += [value] * runs
+        columns['replicate'] += list(range(runs))
+        for output, outcomes in results.items():
+            columns.setdefault(output, [])
+            columns[output] += list(outcomes)
+
+    columns = {name: np.array(column) for name, column in columns.items()}
+    columns['variable'] = columns['variable'].astype(str)
+
+    return columns
+
+
+def ofat_matrix(results, var, output):
+    """
+    Get the outcomes of a one-factor-at-a-time sweep as a matrix.
+
+    Parameters
+    ----------
+    results : pandas.DataFrame
+        results in the long format (see ofat_records)
+    var : str
+        name of the variable
+    output : str
+        name of the output parameter
+
+    Returns
+    -------
+    values : numpy.ndarray
+        values of the variable
+    outcomes : numpy.ndarray (len(values) x replicates)
+        outcome of every replicate (NaN if a value has less replicates)
+    """
+    df = results[results['variable'] == var]
+    values, rows = np.unique(df['value'].values, return_inverse=True)
+    replicates = df['replicate'].values.astype(int)
+
+    outcomes = np.full((len(values), np.max(replicates) + 1), np.nan)
+    outcomes[rows, replicates] = df[output].values
+
+    return values, outcomes
+
+
+def convert_ofat(files, values):
+    """
+    Convert the csv files of the local sensitivity analysis (replicates as a string in every cell) to the long format.
+
+    Parameters
+    ----------
+    files : dict
+        name of the csv file for every output parameter (e.g. {'n_answers': 'ofat_answers.csv'})
+    values : dict
+        values of every variable (the csv files only contain the index)
+
+    Returns
+    -------
+    columns : dict
+        columns variable, value, replicate and one column per output
+    """
+    frames = {output: pd.read_csv(filename, index_col=0) for output, filename in files.items()}
+
+    columns = {}
+    for var, var_values in values.items():
+        data = [{output: ast.literal_eval(df[var][ind]) for output, df in frames.items()} for ind in range(len(var_values))]
+        for name, column in ofat_records(var, var_values, data).items():
+            columns[name] = np.concatenate((columns[name], column)) if name in columns else column
+
+    return columns
+
+
+def convert_gsa(files):
+    """
+    Convert the csv files of the global sensitivity analysis (one file per replicate) to a single table.
+
+    Parameters
+    ----------
+    files : list
+        names of the csv files (in the order of the replicates)
+
+    Returns
+    -------
+    columns : dict
+        columns replicate, sample, the variables and the output parameters
+    """
+    frames = []
+    for replicate, filename in enumerate(files):
+        df = pd.read_csv(filename, index_col=0)
+        df.insert(0, 'sample', np.arange(len(df)))
+        df.insert(0, 'replicate', replicate)
+        frames.append(df)
+
+    df = pd.concat(frames, ignore_index=True)
+
+    return {name: df[name].values for name in df.columns}
+
+
+def sobol_outputs(results, output):
+    """
+    Get the outputs of a global sensitivity analysis in the order of the Saltelli design (for sobol.analyze).
+
+    Parameters
+    ----------
+    results : pandas.DataFrame
+        results with the columns replicate and sample (see convert_gsa)
+    output : str
+        name of the output parameter
+
+    Returns
+    -------
+    Y : numpy.ndarray
+        outputs (all replicates of the design after each other)
+    """
+    order = np.lexsort((results['sample'].values, results['replicate'].values))
+
+    return results[output].values[order].astype(float)
@@ -0,0 +1,214 @@
+"""Global sensitivity analysis on a surrogate model (emulator) of the simulation."""
+
+# Imports
+import glob
+import numpy as np
+import pandas as pd
+from SALib.analyze import sobol
+from SALib.sample import saltelli
+from scipy.stats import qmc
+from sklearn.gaussian_process import GaussianProcessRegressor
+from sklearn.gaussian_process.kernels import ConstantKernel, RBF, WhiteKernel
+
+from sweep import outputs, run_design
+
+variables = {
+    'num_vars' : 5,
+    'names': ['bias', 'mu_p_upvote', 'mu_p_active','std_p_ask', 'std_p_answer'],
+    'bounds': [[1, 40], [0, 1], [0, 1], [0.01, 1], [0.01, 1]]}
+
+# Number of model runs used to train the emulator (instead of 3584 per replicate for the Saltelli design)
+n_train = 256
+# Saltelli sample size used on the emulator (the emulator is cheap)
+n_samples = 4096
+
+
+def design(problem, n, seed=None):
+    """
+    Generate a space-filling design (latin hypercube) within the bounds of the variables.
+
+    Parameters
+    ----------
+    problem : dict
+        definition of the variables (SALib format)
+    n : int
+        number of sample points
+    seed : int
+        seed of the random number generator, default is None
+
+    Returns
+    -------
+    X : numpy.ndarray (n x num_vars)
+        sample points
+    """
+    bounds = np.array(problem['bounds'], dtype=float)
+    sampler = qmc.LatinHypercube(d=problem['num_vars'], seed=seed)
+
+    return qmc.scale(sampler.random(n), bounds[:, 0], bounds[:, 1])
+
+
+class emulator:
+    """
+    Gaussian process emulator of the outputs of the model.
+
+    A separate Gaussian process (anisotropic RBF kernel plus white noise for the stochasticity of the model)
+    is fitted for every output on inputs that are scaled to the unit hypercube.
+
+    Attributes
+    ----------
+    problem : dict
+        definition of the variables (SALib format)
+    models : list
+        fitted Gaussian process for every output
+
+    Methods
+    -------
+    scale(X)
+        Scale the sample points to the unit hypercube.
+    fit(X, Y)
+        Fit the emulator to the outputs of model runs.
+    predict(X)
+        Predict the outputs.
+    """
+
+    def __init__(self, problem):
+        """
+        Initialize an emulator.
+
+        Parameters
+        ----------
+        problem : dict
+            definition of the variables (SALib format)
+        """
+        self.problem = problem
+        self.models = []
+
+    def scale(self, X):
+        """
+        Scale the sample points to the unit hypercube.
+
+        Parameters
+        ----------
+        X : numpy.ndarray
+            sample points
+
+        Returns
+        -------
+        X_scaled : numpy.ndarray
+            scaled sample points
+        """
+        bounds = np.array(self.problem['bounds'], dtype=float)
+
+        return (X - bounds[:, 0]) / (bounds[:, 1] - bounds[:, 0])
+
+    def fit(self, X, Y):
+        """
+        Fit the emulator to the outputs of model runs.
+
+        Parameters
+        ----------
+        X : numpy.ndarray (n x num_vars)
+            sample points
+        Y : numpy.ndarray (n x number of outputs)
+            outputs of the model
+        """
+        X_scaled = self.scale(X)
+        self.models = []
+        for y in np.array(Y).reshape(len(X), -1).T:
+            kernel = ConstantKernel() * RBF(length_scale=np.ones(X.shape[1]), length_scale_bounds=(1e-2, 1e2)) \
+                + WhiteKernel(noise_level=1e-2, noise_level_bounds=(1e-8, 1e1))
+            gp = GaussianProcessRegressor(kernel, normalize_y=True, n_restarts_optimizer=2, random_state=0)
+            self.models.append(gp.fit(X_scaled, y))
+
+    def predict(self, X):
+        """
+        Predict the outputs.
+
+        Parameters
+        ----------
+        X : numpy.ndarray (n x num_vars)
+            sample points
+
+        Returns
+        -------
+        Y : numpy.ndarray (n x number of outputs)
+            predicted outputs (mean of the Gaussian process)
+        """
+        X_scaled = self.scale(X)
+
+        return np.stack([gp.predict(X_scaled) for gp in self.models], axis=1)
+
+
+def sobol_indices(emulator, n=n_samples, names=outputs):
+    """
+    Calculate the first and total order Sobol indices of all outputs on the emulator.
+
+    Parameters
+    ----------
+    emulator : .emulator
+        fitted emulator
+    n : int
+        Saltelli sample size, default is n_samples
+    names : list
+        names of the outputs, default is sweep.outputs
+
+    Returns
+    -------
+    Si : dict
+        result of SALib.analyze.sobol.analyze for every output
+    """
+    X = saltelli.sample(emulator.problem, n, calc_second_order=False)
+    Y = emulator.predict(X)
+
+    return {name: sobol.analyze(emulator.problem, Y[:, i], calc_second_order=False) for i, name in enumerate(names)}
+
+
+def validate(Si, Si_reference):
+    """
+    Compare the Sobol indices of the emulator with the indices of the full simulation.
+
+    Parameters
+    ----------
+    Si : dict
+        Sobol indices for every output (emulator)
+    Si_reference : dict
+        Sobol indices for every output (full simulation)
+
+    Returns
+    -------
+    errors : pandas.DataFrame
+        maximum absolute difference of the first (S1) and total (ST) order indices for every output
+        and if the difference is within the confidence interval of the reference (covered)
+    """
+    errors = pd.DataFrame(index=list(Si_reference), columns=['S1', 'ST', 'covered'])
+    for name, reference in Si_reference.items():
+        diff_S1 = np.abs(np.array(Si[name]['S1']) - reference['S1'])
+        diff_ST = np.abs(np.array(Si[name]['ST']) - reference['ST'])
+        errors.at[name, 'S1'] = np.max(diff_S1)
+        errors.at[name, 'ST'] = np.max(diff_ST)
+        errors.at[name, 'covered'] = bool(np.all(diff_S1 <= reference['S1_conf']) and np.all(diff_ST <= reference['ST_conf']))
+
+    return errors
+
+
+if __name__ == '__main__':
+    X = design(variables, n_train, seed=0)
+    Y = run_design(variables, X, processes=8)
+
+    data = pd.DataFrame(np.concatenate((X, Y), axis=1), columns=variables['names'] + outputs)
+    data.to_csv('surrogate_design.csv')
+
+    gp = emulator(variables)
+    gp.fit(X, Y)
+    Si = sobol_indices(gp)
+
+    for name in outputs:
+        print(name, 'S1', np.round(Si[name]['S1'], 3), 'ST', np.round(Si[name]['ST'], 3))
+
+    # Validate with the indices of the full simulation (if available)
+    files = sorted(glob.glob('../sensitivity_analysis/data/global_sa_[0-9]*.csv'))
+    if files:
+        df_total = pd.concat([pd.read_csv(f) for f in files])
+        Si_reference = {name: sobol.analyze(variables, df_total[name].values.astype(float), calc_second_order=False)
+                        for name in outputs}
+        print(validate(Si, Si_reference))
@@ -0,0 +1,335 @@
+"""Helper functions used to run parameter sweeps over the model (sensitivity analysis)."""
+
+# Imports
+import multiprocessing as mp
+import numpy as np
+import scipy.stats
+
+import cache as caching
+from model import network
+
+# Output parameters collected after every run
+outputs = ['coeff_upvotes', 'coeff_reputation', 'n_questions', 'n_answers']
+
+
+def set_parameter(stackoverflow, var, value):
+    """
+    Change a single parameter of the model.
+
+    Parameters
+    ----------
+    stackoverflow : model.network
+        model of which the parameter is changed
+    var : str
+        name of the parameter ('treshold', 'bias', 'mu_p_ask', 'std_p_ask', ...)
+    value : float
+        new value of the parameter
+    """
+    attributes = ['p_ask', 'p_answer', 'p_upvote', 'p_active']
+
+    if var == 'treshold':
+        stackoverflow.upvote_treshold = value
+    elif var == 'bias':
+        stackoverflow.upvote_bias = value
+    elif var[:3] == 'mu_' and var[3:] in attributes:
+        stackoverflow.distr[attributes.index(var[3:])][0] = value
+    elif var[:4] == 'std_' and var[4:] in attributes:
+        stackoverflow.distr[attributes.index(var[4:])][1] = value
+    else:
+        raise ValueError('Unknown parameter given (%s)' %var)
+
+
+def get_output(stackoverflow):
+    """
+    Collect the output parameters of a finished run.
+
+    Parameters
+    ----------
+    stackoverflow : model.network
+        model after the simulation
+
+    Returns
+    -------
+    output : dict
+        value of every output parameter
+    """
+    output = {'coeff_upvotes': stackoverflow.get_regression_coeff(data='upvotes', binsize=5),
+              'coeff_reputation': stackoverflow.get_regression_coeff(data='reputation', binsize=125),
+              'n_questions': stackoverflow.n_questions,
+              'n_answers': stackoverflow.n_answers}
+
+    return output
+
+
+def simulate(stackoverflow, t, seed=None, cache=None, tol=None, every=5, window=3):
+    """
+    Run the model and collect the output (the network is reset afterwards).
+
+    Parameters
+    ----------
+    stackoverflow : model.network
+        model with the right parameter setting
+    t : int
+        (maximum) number of timesteps
+    seed : int
+        seed of the random number generator, default is None (not seeded)
+    cache : .cache.run_cache
+        cache that is consulted before running the model (only used for seeded runs), default is None
+    tol : float
+        if given, stop a run when its regression coefficients converge (see model.network.run, only for
+        model.network), default is None (always run t timesteps)
+    every : int
+        number of timesteps between two evaluations of the regression coefficients, default is 5
+    window : int
+        number of evaluations over which the coefficients have to be stable, default is 3
+
+    Returns
+    -------
+    output : dict
+        value of every output parameter
+    """
+    use_cache = cache is not None and seed is not None
+    if use_cache:
+        key = caching.run_key(stackoverflow, t, seed, tol, every, window)
+        output = cache.get(key)
+        if output is not None:
+            return output
+
+    if seed is not None:
+        np.random.seed(seed)
+
+    if tol is None:
+        stackoverflow.run(t)
+    else:
+        stackoverflow.run(t, tol=tol, every=every, window=window)
+    output = get_output(stackoverflow)
+    # Reset the network
+    stackoverflow.reset()
+
+    if use_cache:
+        cache.put(key, output)
+
+    return output
+
+
+def evaluate(setting, names, t=20, n=150, engine=network, seed=None, cache=None, tol=None, every=5, window=3):
+    """
+    Run the model for a single sample point.
+
+    Parameters
+    ----------
+    setting : numpy.ndarray
+        value of every variable
+    names : list
+        names of the variables
+    t : int
+        number of timesteps, default is 20
+    n : int
+        number of users added every timestep, default is 150
+    engine : class
+        model that is run (e.g. meanfield.meanfield), default is model.network
+    seed : int
+        seed of the random number generator, default is None (not seeded)
+    cache : .cache.run_cache
+        cache that is consulted before running the model (only used for seeded runs), default is None
+    tol : float
+        if given, stop a run when its regression coefficients converge (see model.network.run, only for
+        model.network), default is None (always run t timesteps)
+    every : int
+        number of timesteps between two evaluations of the regression coefficients, default is 5
+    window : int
+        number of evaluations over which the coefficients have to be stable, default is 3
+
+    Returns
+    -------
+    y : list
+        value of every output parameter (same order as sweep.outputs)
+    """
+    stackoverflow = engine(n, 'tags.txt')
+    for name, value in zip(names, setting):
+        if name == 'treshold' or name == 'bias':
+            value = int(value)
+        set_parameter(stackoverflow, name, value)
+
+    output = simulate(stackoverflow, t, seed, cache, tol, every, window)
+
+    return [output[param] for param in outputs]
+
+
+def run_design(problem, X, t=20, n=150, processes=None, engine=network, tol=None, every=5, window=3):
+    """
+    Run the model for all points of a design (in parallel).
+
+    Parameters
+    ----------
+    problem : dict
+        definition of the variables (SALib format)
+    X : numpy.ndarray
+        sample points
+    t : int
+        number of timesteps, default is 20
+    n : int
+        number of users added every timestep, default is 150
+    processes : int
+        number of processes, default is None (number of cpus)
+    engine : class
+        model that is run (e.g. meanfield.meanfield), default is model.network
+    tol : float
+        if given, stop a run when its regression coefficients converge (see model.network.run, only for
+        model.network), default is None (always run t timesteps)
+    every : int
+        number of timesteps between two evaluations of the regression coefficients, default is 5
+    window : int
+        number of evaluations over which the coefficients have to be stable, default is 3
+
+    Returns
+    -------
+    Y : numpy.ndarray (len(X) x len(outputs))
+        outputs for all sample points
+    """
+    # Forked workers inherit the state of the random number generator, so every worker is reseeded
+    with mp.Pool(processes, initializer=np.random.seed) as pool:
+        Y = pool.starmap(evaluate, [(setting, problem['names'], t, n, engine, None, None, tol, every, window)
+                                          for setting in X])
+
+    return np.array(Y, dtype=float)
+
+
+def ci_width(values, confidence=0.95):
+    """
+    Calculate the width of the confidence interval of the mean.
+
+    Parameters
+    ----------
+    values : list
+        outcomes of the replicates
+    confidence : float
+        confidence level, default is 0.95
+
+    Returns
+    -------
+    width : float
+        width of the confidence interval (student t)
+    """
+    n = len(values)
+    if n < 2:
+        return np.inf
+
+    t = scipy.stats.t.ppf(0.5 + confidence / 2, n - 1)
+
+    return 2 * t * np.std(values, ddof=1) / np.sqrt(n)
+
+
+def is_converged(data, rel_width=0.05, confidence=0.95):
+    """
+    Check if the confidence interval of every output is small enough.
+
+    Parameters
+    ----------
+    data : dict
+        outcomes of the replicates for every output parameter
+    rel_width : float
+        maximum width of the confidence interval relative to the absolute value of the mean, default is 0.05
+    confidence : float
+        confidence level, default is 0.95
+
+    Returns
+    -------
+    converged : bool
+        True if the confidence interval of all outputs is below the target width
+    """
+    for values in data.values():
+        if ci_width(values, confidence) > rel_width * np.abs(np.mean(values)):
+            return False
+
+    return True
+
+
+def run_replicates(stackoverflow, t, runs, seed=None, cache=None, start=0, tol=None, every=5, window=3):
+    """
+    Run a fixed number of replicates of the same setting.
+
+    Parameters
+    ----------
+    stackoverflow : model.network
+        model with the right parameter setting
+    t : int
+        number of timesteps of a single run
+    runs : int
+        number of replicates
+    seed : int
+        seed of the first replicate (replicate i uses seed + i), default is None (not seeded)
+    cache : .cache.run_cache
+        cache that is consulted before running the model (only used for seeded runs), default is None
+    start : int
+        index of the first replicate, default is 0
+    tol : float
+        if given, stop a run when its regression coefficients converge (see model.network.run, only for
+        model.network), default is None (always run t timesteps)
+    every : int
+        number of timesteps between two evaluations of the regression coefficients, default is 5
+    window : int
+        number of evaluations over which the coefficients have to be stable, default is 3
+
+    Returns
+    -------
+    data : dict
+        outcomes of the replicates for every output parameter
+    """
+    data = {output: [] for output in outputs}
+
+    for i in range(start, start + runs):
+        output = simulate(stackoverflow, t, None if seed is None else seed + i, cache, tol, every, window)
+        for param, value in output.items():
+            data[param].append(value)
+
+    return data
+
+
+def run_adaptive(stackoverflow, t, min_runs=3, max_runs=50, rel_width=0.05, confidence=0.95, seed=None, cache=None,
+                 tol=None, every=5, window=3):
+    """
+    Run replicates of the same setting until the confidence interval of every output is small enough.
+
+    Parameters
+    ----------
+    stackoverflow : model.network
+        model with the right parameter setting
+    t : int
+        number of timesteps of a single run
+    min_runs : int
+        minimum number of replicates, default is 3
+    max_runs : int
+        maximum number of replicates, default is 50
+    rel_width : float
+        maximum width of the confidence interval relative to the absolute value of the mean, default is 0.05
+    confidence : float
+        confidence level, default is 0.95
+    seed : int
+        seed of the first replicate (replicate i uses seed + i), default is None (not seeded)
+    cache : .cache.run_cache
+        cache that is consulted before running the model (only used for seeded runs), default is None
+    tol : float
+        if given, stop a run when its regression coefficients converge (see model.network.run, only for
+        model.network), default is None (always run t timesteps)
+    every : int
+        number of timesteps between two evaluations of the regression coefficients, default is 5
+    window : int
+        number of evaluations over which the coefficients have to be stable, default is 3
+
+    Returns
+    -------
+    data : dict
+        outcomes of the replicates for every output parameter
+    runs : int
+        number of replicates that were needed
+    """
+    data = run_replicates(stackoverflow, t, min_runs, seed, cache, tol=tol, every=every, window=window)
+    runs = min_runs
+
+    while runs < max_runs and not is_converged(data, rel_width, confidence):
+        for output, values in run_replicates(stackoverflow, t, 1, seed, cache, runs, tol, every, window).items():
+            data[output] += values
+        runs += 1
+
+    return data, runs
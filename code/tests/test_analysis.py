@@ -0,0 +1,47 @@
+"""Test file for the statistics of the sensitivity analysis."""
+
+# Imports
+import numpy as np
+import pandas as pd
+import unittest
+from SALib.analyze import sobol
+from SALib.sample import saltelli
+import analysis
+import store
+
+class test_analysis(unittest.TestCase):
+
+    def test_sobol(self):
+        # Ishigami function and a linear function of the same variables
+        problem = {'num_vars': 3, 'names': ['x1', 'x2', 'x3'], 'bounds': [[-np.pi, np.pi]] * 3}
+        X = saltelli.sample(problem, 256, calc_second_order=False)
+        Y = np.stack((np.sin(X[:, 0]) + 7 * np.sin(X[:, 1])**2 + 0.1 * X[:, 2]**4 * np.sin(X[:, 0]),
+                      X[:, 0] + 2 * X[:, 1]), axis=1)
+
+        Si = analysis.sobol_analyze(Y, 3, names=['ishigami', 'linear'], num_resamples=50, processes=2, seed=0)
+        for k, name in enumerate(['ishigami', 'linear']):
+            reference = sobol.analyze(problem, Y[:, k], calc_second_order=False, num_resamples=50, seed=0)
+            self.assertTrue(np.allclose(Si[name]['S1'], reference['S1']))
+            self.assertTrue(np.allclose(Si[name]['ST'], reference['ST']))
+            self.assertTrue(np.all(Si[name]['S1_conf'] >= 0))
+
+        with self.assertRaises(RuntimeError):
+            analysis.sobol_analyze(Y[:-1], 3)
+
+    def test_ofat_summary(self):
+        data = [{'n_questions': [1, 2, 3], 'n_answers': [2, 4, 6]}, {'n_questions': [4, 6], 'n_answers': [1, 1]}]
+        results = pd.DataFrame(store.ofat_records('bias', [1, 10], data))
+
+        summary = analysis.ofat_summary(results, ['n_questions', 'n_answers'], num_resamples=200, seed=0)
+        self.assertEqual(list(summary['n']), [3, 2])
+        self.assertEqual(list(summary['n_questions_mean']), [2, 5])
+        self.assertTrue(np.allclose(summary['n_answers_std'], [2, 0]))
+
+        # Bootstrap interval contains the mean and stays within the range of the data
+        self.assertTrue(np.all(summary['n_questions_low'] <= summary['n_questions_mean']))
+        self.assertTrue(np.all(summary['n_questions_high'] >= summary['n_questions_mean']))
+        self.assertEqual(summary['n_answers_low'][1], 1)
+        self.assertTrue(summary['n_questions_low'][0] >= 1 and summary['n_questions_high'][0] <= 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+"""Test file for the statistical comparison of two implementations."""
+
+# Imports
+import functools
+import numpy as np
+import unittest
+import equivalence
+import model
+
+class test_equivalence(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+
+    def test_pdf_matrix(self):
+        P = equivalence.pdf_matrix([{5.0: 0.5, 10.0: 0.5}, {5.0: 1.0}, {15.0: 1.0}])
+        self.assertTrue(np.allclose(P, [[0.5, 0.5, 0], [1, 0, 0], [0, 0, 1]]))
+
+    def test_permutation_test(self):
+        # Same distribution
+        P = np.random.dirichlet([5, 3, 1], size=20)
+        Q = np.random.dirichlet([5, 3, 1], size=20)
+        statistic, p_value = equivalence.permutation_test(P, Q)
+        self.assertTrue(p_value > 0.01)
+
+        # Different distribution
+        Q = np.random.dirichlet([3, 3, 3], size=20)
+        statistic, p_value = equivalence.permutation_test(P, Q)
+        self.assertAlmostEqual(p_value, 1 / 1000)
+        self.assertAlmostEqual(statistic, np.sum(np.abs(P.mean(axis=0) - Q.mean(axis=0))))
+
+    def test_false_alarm(self):
+        # Samples from the same distribution are rarely flagged as different
+        def sample(runs):
+            return [{'coeff_upvotes': np.random.normal(-2, 0.1), 'coeff_reputation': np.random.normal(-1.8, 0.1),
+                     'n_questions': np.random.poisson(500), 'n_answers': np.random.poisson(1000),
+                     'upvote_distr': dict(zip([5.0, 10.0], np.random.dirichlet([9, 1]))),
+                     'reputation_distr': dict(zip([125.0, 250.0], np.random.dirichlet([9, 1])))}
+                    for _ in range(runs)]
+
+        flagged = [equivalence.compare(sample(20), sample(20), alpha=0.1, n_permutations=199)['different'].any()
+                   for _ in range(30)]
+        self.assertTrue(np.mean(flagged) <= 0.2)
+
+    def test_non_finite(self):
+        # NaN outputs of the alternative are reported as different (no p-value)
+        def sample(runs, coeff):
+            return [{'coeff_upvotes': coeff, 'coeff_reputation': coeff, 'n_questions': np.random.poisson(500),
+                     'n_answers': np.random.poisson(1000), 'upvote_distr': {5.0: 1.0}, 'reputation_distr': {125.0: 1.0}}
+                    for _ in range(runs)]
+
+        comparison = equivalence.compare(sample(20, -2.0), sample(20, np.nan)).set_index('output')
+        self.assertTrue(comparison.loc['coeff_upvotes', 'different'])
+        self.assertTrue(comparison.loc['coeff_reputation', 'different'])
+        self.assertFalse(comparison.loc['n_questions', 'different'])
+
+        # Also in a distribution
+        alternative = sample(20, -2.0)
+        alternative[0]['upvote_distr'] = {5.0: np.nan}
+        comparison = equivalence.compare(sample(20, -2.0), alternative).set_index('output')
+        self.assertTrue(comparison.loc['upvote_distr', 'different'])
+
+    def test_models(self):
+        reference = functools.partial(model.network, 10, 'tags.txt')
+        same, comparison = equivalence.equivalent(reference, reference, t=4, runs=8, processes=2)
+        self.assertEqual(len(comparison), 6)
+        self.assertTrue(same)
+
+        # Clearly different setting is detected
+        alternative = functools.partial(model.network, 10, 'tags.txt', distr=[[0.9, 0.25], [0.5, 0.25], [0.5, 0.25], [0.5, 0.25]])
+        same, comparison = equivalence.equivalent(reference, alternative, t=4, runs=8, processes=2)
+        self.assertFalse(same)
+        self.assertTrue(comparison.set_index('output').loc['n_questions', 'different'])
+
+if __name__ == '__main__':
+    unittest.main()
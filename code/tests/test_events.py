@@ -0,0 +1,51 @@
+"""Test file for the recording of the events of a simulation."""
+
+# Imports
+import numpy as np
+import os
+import tempfile
+import unittest
+import events
+import model
+
+class test_events(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        self.network = model.network(20, 'tags.txt', treshold=1)
+        self.dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.dir.name, 'events.bin')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_recording(self):
+        # Small buffer to test writing in several blocks
+        self.network.recorder = events.recorder(self.filename, buffer_size=10)
+        self.network.run(4)
+
+        data = events.read_events(self.filename)
+        self.assertEqual(len(data), self.network.recorder.n_events)
+        self.assertTrue(np.all(np.diff(data['step']) >= 0))
+
+        # Events match the counters of the network
+        self.assertEqual(np.sum(data['kind'] == events.kinds['ask']), self.network.n_questions)
+        self.assertEqual(np.sum(data['kind'] == events.kinds['answer']), self.network.n_answers)
+        n_upvotes = np.sum(data['kind'] == events.kinds['upvote_question']) + np.sum(data['kind'] == events.kinds['upvote_answer'])
+        self.assertEqual(n_upvotes, self.network.n_upvotes)
+
+        # Last reputation event of every user equals the final reputation
+        rep = data[data['kind'] == events.kinds['reputation']]
+        for user_id in np.unique(rep['actor']):
+            self.assertEqual(rep[rep['actor'] == user_id]['value'][-1], self.network.users[user_id].reputation)
+
+        # Who upvotes whom
+        edges, counts = events.interactions(data, 'upvote_answer')
+        self.assertEqual(np.sum(counts), np.sum(data['kind'] == events.kinds['upvote_answer']))
+
+    def test_empty(self):
+        events.recorder(self.filename)
+        self.assertEqual(len(events.read_events(self.filename)), 0)
+
+if __name__ == '__main__':
+    unittest.main()
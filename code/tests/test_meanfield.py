@@ -0,0 +1,113 @@
+"""Test file for the mean-field approximation."""
+
+# Imports
+import numpy as np
+import scipy.stats
+import unittest
+from scipy.special import expit
+import meanfield
+import sweep
+
+class test_meanfield(unittest.TestCase):
+
+    def setUp(self):
+        self.meanfield = meanfield.meanfield(20, 'tags.txt')
+
+    def test_sequential(self):
+        # Without trials nothing changes
+        self.assertTrue(np.allclose(meanfield.sequential(np.array([0.0]), np.array([0.5]), 2), 2))
+
+        # First trial is exact
+        self.assertAlmostEqual(meanfield.sequential(1, -10), expit(-10))
+        self.assertAlmostEqual(meanfield.sequential(0.5, 0.3, 1), 1 + 0.5 * expit(-0.7))
+
+        # Remaining trials follow the continuum limit (many small trials)
+        x = 0.3
+        a = expit(x)
+        for _ in range(9000):
+            a += 0.001 * expit(x - a)
+        self.assertAlmostEqual(meanfield.sequential(10, x), a, places=3)
+
+        # Close to the expectation of the stochastic process
+        np.random.seed(0)
+        a = np.zeros(100000)
+        for _ in range(8):
+            a += np.random.uniform(size=len(a)) < expit(x - a)
+        self.assertTrue(abs(meanfield.sequential(8, x) / np.mean(a) - 1) < 0.1)
+
+    def test_feedback_diff(self):
+        # Expectation of the clipped difference over a Poisson number of upvotes
+        mean = np.array([0.0, 2.0, 12.0, 40.0])
+        k = np.arange(200)
+        expected = scipy.stats.poisson.pmf(k, mean[:, None]) @ np.clip(k - 12, -meanfield.max_diff, meanfield.max_diff)
+        self.assertTrue(np.allclose(meanfield.feedback_diff(mean, 12), expected))
+
+        # Differs from the difference at the mean when the upvotes are close to the bias
+        self.assertAlmostEqual(meanfield.feedback_diff(np.array([0.0]), 1)[0], -1)
+        self.assertTrue(abs(meanfield.feedback_diff(np.array([12.0]), 12)[0]) < 0.1)
+        self.assertTrue(meanfield.feedback_diff(np.array([8.0]), 12)[0] > -4)
+        self.assertTrue(np.allclose(meanfield.feedback_diff(mean, -10), meanfield.max_diff))
+
+    def test_step(self):
+        self.meanfield.run(5)
+
+        n_tags = len(self.meanfield.tag_pdf)
+        self.assertEqual(self.meanfield.time, 5)
+        self.assertEqual(len(self.meanfield.weight), 5 * n_tags * self.meanfield.n_nodes)
+        self.assertAlmostEqual(np.sum(self.meanfield.weight), 100)
+
+        # Questions are asked and answered, nobody is privileged at the start (treshold 15)
+        self.assertTrue(self.meanfield.n_questions > 0)
+        self.assertTrue(self.meanfield.n_answers > 0)
+        self.assertTrue(np.all(self.meanfield.privileged_fraction() <= 1))
+        self.assertTrue(np.all(np.abs(self.meanfield.logit) <= meanfield.max_logit))
+
+        # Deterministic engine
+        other = meanfield.meanfield(20, 'tags.txt')
+        other.run(5)
+        self.assertEqual(other.n_answers, self.meanfield.n_answers)
+
+        self.meanfield.reset()
+        self.assertEqual(self.meanfield.time, 0)
+        self.assertEqual(len(self.meanfield.weight), 0)
+
+    def test_distr(self):
+        self.meanfield.run(10)
+        for data, binsize in [('upvotes', 5), ('reputation', 125)]:
+            if data == 'upvotes':
+                pdf, bins = self.meanfield.get_upvote_distr(binsize)
+            else:
+                pdf, bins = self.meanfield.get_reputation_distr(binsize)
+            self.assertAlmostEqual(np.sum(pdf), 1)
+            self.assertEqual(len(pdf), len(bins))
+            self.assertEqual(bins[0], binsize)
+
+    def test_sweep(self):
+        # Same interface as the agent-based model
+        sweep.set_parameter(self.meanfield, 'mu_p_ask', 0.8)
+        output = sweep.simulate(self.meanfield, 5)
+        self.assertEqual(set(output), set(sweep.outputs))
+        self.assertEqual(self.meanfield.time, 0)
+
+        y = sweep.evaluate([0.8], ['mu_p_ask'], t=5, n=20, engine=meanfield.meanfield)
+        self.assertAlmostEqual(y[sweep.outputs.index('n_questions')], output['n_questions'])
+
+        # More questions with a higher probability to ask
+        y_low = sweep.evaluate([0.2], ['mu_p_ask'], t=5, n=20, engine=meanfield.meanfield)
+        self.assertTrue(y_low[sweep.outputs.index('n_questions')] < output['n_questions'])
+
+    def test_validate(self):
+        comparison = meanfield.validate([{}], t=3, n=10, runs=2)
+        self.assertEqual(list(comparison['output']), sweep.outputs)
+        self.assertTrue(np.all(comparison['time_abm'] > 0))
+
+        # Only the counts are approximated, with their error bound
+        counts = comparison['output'].isin(list(meanfield.error_bounds))
+        self.assertEqual(set(comparison['output'][counts]), {'n_questions', 'n_answers'})
+        self.assertTrue(np.all(np.isnan(comparison['meanfield'][~counts])))
+        self.assertTrue(np.all(np.isnan(comparison['bound'][~counts])))
+        self.assertFalse(np.any(comparison['within'][~counts]))
+        self.assertTrue(np.all(comparison['bound'][counts] > 0))
+
+if __name__ == '__main__':
+    unittest.main()
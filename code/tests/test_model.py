@@ -1,9 +1,11 @@
 """Test file for the model that represents the Stack overflow network."""
 
 # Imports
+import gc
 import numpy as np
 import unittest
 import model
+import observer
 
 class test_model(unittest.TestCase):
 
@@ -11,11 +13,12 @@ class test_model(unittest.TestCase):
         # Initialize several models with different settings
         self.network1 = model.network(20, 'tags.txt')
         self.network2 = model.network(20, 'tags.txt', treshold=5, bias=4, distr=[[0.4, 0.75], [None, None], [2, None], [None, 0.3]])
+        self.network3 = model.network(20, 'tags.txt', treshold=5, bias=4, distr=[[0.4, 0.75], [None, None], [2, None], [None, 0.3]])
 
-        # Create one user in every model
+        # Create one user in every model (network2 only contains the users with the same tag below)
         np.random.seed(0)
         self.user1 = self.network1.create_user(0)
-        self.user2 = self.network2.create_user(1)
+        self.user2 = self.network3.create_user(1)
 
         # Create several users with the same tag
         self.user3 = self.network2.create_user(0)
@@ -29,9 +32,8 @@ class test_model(unittest.TestCase):
         self.user6.tag = 4
         self.user7.tag = 5
 
-        # Add users to the network
+        # Add users to the network (the members of every tag follow from the tags set above)
         self.network2.users = [self.user3, self.user4, self.user5, self.user6, self.user7]
-        self.network2.tags = [[],[],[], [], [self.user6.id], [self.user3.id, self.user4.id, self.user5.id, self.user7.id]]
 
         # Set some probabilities to have certain interactions
         self.user3.p_ask = 0.999
@@ -59,11 +61,11 @@ class test_model(unittest.TestCase):
         self.assertEqual(self.user1.upvote_bias, 12)
         self.assertEqual(self.user2.upvote_bias, 4)
 
-        # Check if probabilities were drawn from the right distribution
-        self.assertEqual(self.user2.p_ask, 0.42230568454271344)
-        self.assertEqual(self.user2.p_answer, 0.8917730007820798)
-        self.assertEqual(self.user2.p_interact, 0.8956153681081356)
-        self.assertEqual(self.user2.p_active, 0.3834415188257777)
+        # Check if probabilities were drawn from the right distribution (stored as float32)
+        self.assertEqual(self.user2.p_ask, np.float32(0.42230568454271344))
+        self.assertEqual(self.user2.p_answer, np.float32(0.8917730007820798))
+        self.assertEqual(self.user2.p_interact, np.float32(0.8956153681081356))
+        self.assertEqual(self.user2.p_active, np.float32(0.3834415188257777))
 
         # Check if starting reputation is 1
         self.assertEqual(self.user1.reputation, 1)
@@ -73,9 +75,108 @@ class test_model(unittest.TestCase):
         self.network1.step()
         self.assertEqual(len(self.network1.users), 20)
 
+        # Test if the index of users with pending/visible questions is correct
+        for _ in range(3):
+            self.network1.step()
+            for user in self.network1.users:
+                self.assertEqual(user.id in self.network1.pending, len(user.my_questions) > 0)
+                self.assertEqual(user.id in self.network1.visible, len(user.vis_questions) > 0)
+
+    def test_statistics(self):
+        # Test if the summary statistics kept during the run match a scan over the system
+        collector = observer.collector()
+        self.network1.run(4, observers=[collector])
+
+        n_answers = sum([len(q.answers) for q in self.network1.questions])
+        n_upvotes = sum([len(q.upvotes) + sum([len(a.upvotes) for a in q.answers]) for q in self.network1.questions])
+        reputation = np.mean([user.reputation for user in self.network1.users])
+        p_active = np.mean([user.p_active for user in self.network1.users])
+
+        self.assertEqual(collector.n_steps, 4)
+        self.assertEqual(list(collector.get('n_users')), [20, 40, 60, 80])
+        self.assertEqual(collector.get('n_questions')[-1], len(self.network1.questions))
+        self.assertEqual(collector.get('n_answers')[-1], n_answers)
+        self.assertEqual(collector.get('n_upvotes')[-1], n_upvotes)
+        self.assertAlmostEqual(collector.get('mean_reputation')[-1], reputation)
+        self.assertAlmostEqual(collector.get('mean_p_active')[-1], p_active)
+
+        # Live histograms match the distributions of the final state
+        upvotes = [user.n_questions_upvoted + user.n_answers_upvoted for user in self.network1.users]
+        reputation = [user.reputation for user in self.network1.users]
+        for (pdf, bins), values, binsize in [(self.network1.get_upvote_distr(5), upvotes, 5),
+                                             (self.network1.get_reputation_distr(125), reputation, 125)]:
+            counts = np.bincount(np.array(values) // binsize)
+            self.assertTrue(np.array_equal(pdf, counts / np.sum(counts)))
+            self.assertTrue(np.array_equal(bins, np.arange(binsize, max(values) + binsize + 1, binsize)))
+
+        # Statistics are cleared when the system is reset
+        self.network1.reset()
+        self.assertEqual(self.network1.n_questions, 0)
+        self.assertEqual(self.network1.time, 0)
+
+    def test_convergence(self):
+        # Test if a run stops once the regression coefficients are stable
+        tol, every, window = 0.05, 2, 2
+        stackoverflow = model.network(20, 'tags.txt')
+        np.random.seed(1)
+        converged_at = stackoverflow.run(60, tol=tol, every=every, window=window)
+        self.assertTrue(converged_at is not None and converged_at < 60)
+        self.assertEqual(stackoverflow.time, converged_at)
+
+        # Same run step by step: coefficients are only evaluated when both distributions have two non-empty bins
+        network = model.network(20, 'tags.txt')
+        np.random.seed(1)
+        coeffs = []
+        stop = None
+        while stop is None:
+            network.step()
+            if network.time % every == 0 and network.upvote_hist.n_nonempty() >= 2 and network.reputation_hist.n_nonempty() >= 2:
+                coeffs.append([network.get_regression_coeff('upvotes', 5), network.get_regression_coeff('reputation', 125)])
+                self.assertTrue(np.all(np.array(coeffs[-1]) != 0))
+                if len(coeffs) > window and np.max(np.abs(np.array(coeffs[-window - 1:]) - coeffs[-1])) < tol:
+                    stop = network.time
+        self.assertEqual(stop, converged_at)
+
+        # Never converged when the tolerance is not reached
+        stackoverflow.reset()
+        self.assertEqual(stackoverflow.run(10, tol=0, every=1, window=1), None)
+        self.assertEqual(stackoverflow.time, 10)
+
+    def test_replicates(self):
+        # Storage of a run is allocated at once and reused after a reset
+        network = model.network(20, 'tags.txt')
+        np.random.seed(1)
+        network.run(5)
+        capacity = network.agents.capacity
+        users = network.users
+        output = [network.n_questions, network.n_answers, network.reputation_total]
+        self.assertTrue(capacity >= 20 * 5)
+
+        # Garbage collector is enabled again after the run
+        self.assertTrue(gc.isenabled())
+
+        network.reset()
+        self.assertEqual(len(network.users), 0)
+        # Lists of the previous run are not emptied, but its users no longer refer to the reused slots
+        self.assertEqual(len(users), 20 * 5)
+        with self.assertRaises(RuntimeError):
+            users[0].reputation
+        with self.assertRaises(RuntimeError):
+            users[0].reputation = 10
+        self.assertTrue(all([len(members) == 0 for members in network.tags]))
+
+        # Same output as the first replicate
+        np.random.seed(1)
+        network.run(5)
+        self.assertEqual(network.agents.capacity, capacity)
+        self.assertEqual([network.n_questions, network.n_answers, network.reputation_total], output)
+
     def test_asking(self):
         # Test if the dynamics of asking a question are correct
 
+        # Members of the tags (ids) follow from the tags of the users
+        self.assertEqual([list(members) for members in self.network2.tags[4:6]], [[3], [0, 1, 2, 4]])
+
         # Question is asked
         self.assertEqual(self.user3.n_questions_asked, 1)
         self.assertEqual(len(self.user3.my_questions), 1)
@@ -134,6 +235,24 @@ class test_model(unittest.TestCase):
         self.assertEqual(self.user4.n_questions_upvoted, 1)
         self.assertEqual(self.user3.reputation, 11)
 
+    def test_privilege(self):
+        # Test if the upvoting privilege follows the reputation and the treshold
+        self.user4.p_interact = 0.999
+        self.user4.p_answer = 0.01
+
+        # Reputation written directly (not through the network) above the treshold
+        self.network2.upvote_treshold = 50
+        self.user4.reputation = 100
+        self.user4.step()
+        self.assertEqual(self.user3.my_questions[0].upvotes, [self.user4.id])
+
+        # Treshold raised above the reputation
+        self.user3.ask_question(0)
+        self.network2.upvote_treshold = 200
+        self.assertEqual(len(self.user4.vis_questions), 1)
+        self.user4.step()
+        self.assertEqual(len(self.user3.my_questions[1].upvotes), 0)
+
     def test_feedback(self):
         # Test if the feedback mechanism to update the probabilities is correct
         self.user4.p_answer = 0.999
@@ -0,0 +1,80 @@
+"""Test file for the compact storage of the users."""
+
+# Imports
+import numpy as np
+import unittest
+import model
+import population
+import user
+
+class test_population(unittest.TestCase):
+
+    def setUp(self):
+        self.population = population.population(capacity=2)
+
+    def test_allocate(self):
+        slots = [self.population.allocate() for _ in range(5)]
+        self.assertEqual(slots, [0, 1, 2, 3, 4])
+        self.assertEqual(self.population.size, 5)
+        self.assertEqual(self.population.capacity, 8)
+        self.assertEqual(self.population.p_ask.dtype, np.float32)
+        self.assertEqual(self.population.tag.dtype, np.int16)
+
+        # Values are kept when the arrays grow
+        self.population.reputation[1] = 7
+        for _ in range(5):
+            self.population.allocate()
+        self.assertEqual(self.population.reputation[1], 7)
+
+        self.population.clear()
+        self.assertEqual(self.population.size, 0)
+        self.assertEqual(self.population.reputation[1], 0)
+
+        # Less than 64 bytes per user
+        self.assertTrue(self.population.nbytes() / self.population.capacity <= 64)
+
+    def test_view(self):
+        stackoverflow = model.network(20, 'tags.txt')
+        np.random.seed(0)
+        user1 = stackoverflow.create_user(3)
+        user2 = stackoverflow.create_user(3)
+
+        # Users with the same id have their own slot
+        self.assertNotEqual(user1.slot, user2.slot)
+        user1.reputation += 10
+        self.assertEqual(user1.reputation, 11)
+        self.assertEqual(user2.reputation, 1)
+        self.assertEqual(stackoverflow.agents.reputation[user1.slot], 11)
+
+        # Values are python types with the precision of the storage
+        user1.p_ask = 0.1
+        self.assertEqual(type(user1.p_ask), float)
+        self.assertEqual(user1.p_ask, np.float32(0.1))
+
+        # Only the attributes of the population can be set
+        with self.assertRaises(AttributeError):
+            user1.unknown = 1
+
+    def test_probability_bounds(self):
+        stackoverflow = model.network(20, 'tags.txt')
+        np.random.seed(0)
+        user1 = stackoverflow.create_user(0)
+        q = user.question(1, user1.tag)
+
+        # Probabilities that would round to 0 or 1 in float32 are clipped (finite logit)
+        user1.p_answer = 1 - 1e-8
+        self.assertTrue(user1.p_answer < 1)
+        self.assertEqual(user1.p_answer, np.float32(population.p_max))
+        self.assertIn(user1.answer_question(q), [0, 1])
+
+        user1.p_interact = 0
+        self.assertEqual(user1.p_interact, population.p_min)
+        self.assertTrue(np.isfinite(np.log(user1.p_interact / (1 - user1.p_interact))))
+
+        # Feedback keeps the probability in range
+        user1.p_active = population.p_max
+        user1.feedback('p_active', 100)
+        self.assertEqual(user1.p_active, np.float32(population.p_max))
+
+if __name__ == '__main__':
+    unittest.main()
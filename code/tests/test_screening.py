@@ -0,0 +1,35 @@
+"""Test file for the Morris screening of the parameters."""
+
+# Imports
+import numpy as np
+import unittest
+from SALib.sample import morris as morris_sample
+import model
+import screening
+import sweep
+
+class test_screening(unittest.TestCase):
+
+    def test_screen(self):
+        problem = {'num_vars': 4, 'names': ['a', 'b', 'c', 'd'], 'bounds': [[0, 1], [0, 1], [0, 10], [0, 1]]}
+        X = morris_sample.sample(problem, 20, num_levels=4, seed=0)
+
+        # Output 1 depends on a, output 2 on c (and very weakly on d), b has no influence
+        Y = np.stack((5 * X[:, 0], X[:, 2]**2 + 0.001 * X[:, 3]), axis=1)
+        keep, Si = screening.screen(problem, X, Y, cutoff=0.1, names=['y1', 'y2'])
+
+        self.assertEqual(keep, ['a', 'c'])
+        self.assertEqual(set(Si), {'y1', 'y2'})
+
+        reduced = screening.reduce_problem(problem, keep)
+        self.assertEqual(reduced, {'num_vars': 2, 'names': ['a', 'c'], 'bounds': [[0, 1], [0, 10]]})
+
+    def test_variables(self):
+        # Every tunable parameter of the model can be set in the sweeps
+        stackoverflow = model.network(10, 'tags.txt')
+        for name, bounds in zip(screening.variables['names'], screening.variables['bounds']):
+            sweep.set_parameter(stackoverflow, name, bounds[1])
+        self.assertEqual(stackoverflow.distr, [[1, 1]] * 4)
+
+if __name__ == '__main__':
+    unittest.main()
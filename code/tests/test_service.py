@@ -0,0 +1,117 @@
+"""Test file for the sweep service."""
+
+# Imports
+import asyncio
+import json
+import numpy as np
+import os
+import tempfile
+import unittest
+from unittest import mock
+import service
+import sweep
+
+def exit_worker(*args):
+    # Run that kills its worker process
+    os._exit(1)
+
+class test_service(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.address = os.path.join(self.directory.name, 'sweep.sock')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def with_service(self, client):
+        # Run a client coroutine against a service with a single worker
+        async def main():
+            started = asyncio.Event()
+            server = asyncio.create_task(service.service(1).serve(self.address, started))
+            await started.wait()
+            try:
+                return await client()
+            finally:
+                server.cancel()
+                await asyncio.gather(server, return_exceptions=True)
+
+        return asyncio.run(main())
+
+    def test_jobs(self):
+        names = ['mu_p_ask', 'bias']
+        settings = [[0.3, 2], [0.6, 4]]
+        progress = []
+
+        async def client():
+            # Two jobs of different clients are served at the same time
+            return await asyncio.gather(
+                service.request(names, settings, runs=2, t=2, n=5, seed=0, address=self.address,
+                                progress=lambda done, total: progress.append((done, total))),
+                service.request(names[:1], [[0.5]], t=2, n=5, engine='meanfield', address=self.address))
+
+        Y, Y_meanfield = self.with_service(client)
+        self.assertEqual(Y.shape, (2, 2, len(sweep.outputs)))
+        self.assertEqual(Y_meanfield.shape, (1, 1, len(sweep.outputs)))
+        self.assertEqual(progress, [(done, 4) for done in range(1, 5)])
+
+        # Replicate r of every setting uses seed + r
+        for i, setting in enumerate(settings):
+            for r in range(2):
+                self.assertTrue(np.allclose(Y[i, r], sweep.evaluate(setting, names, t=2, n=5, seed=r)))
+
+    def test_errors(self):
+        async def client():
+            # Failing run
+            with self.assertRaises(RuntimeError):
+                await service.request(['unknown'], [[1]], t=2, n=5, address=self.address)
+
+            # Invalid request and status of the idle service
+            reader, writer = await service.connect(self.address)
+            await service.send(writer, {'type': 'submit', 'names': ['bias'], 'settings': [[1, 2]]})
+            error = json.loads(await reader.readline())
+
+            # Invalid fields are rejected before the job is queued
+            replies = []
+            for request in [{'seed': 'x'}, {'runs': 0}, {'t': 2.5}, {'names': 'bias'}, {'settings': [['x']]}]:
+                message = {'type': 'submit', 'names': ['bias'], 'settings': [[1]]}
+                message.update(request)
+                await service.send(writer, message)
+                replies.append(json.loads(await reader.readline()))
+
+            # Valid json that is not an object
+            for message in [[], 'x']:
+                await service.send(writer, message)
+                replies.append(json.loads(await reader.readline()))
+
+            await service.send(writer, {'type': 'status'})
+            status = json.loads(await reader.readline())
+            writer.close()
+
+            # Service still runs the jobs of other clients
+            Y = await asyncio.wait_for(service.request(['bias'], [[1]], t=2, n=5, seed=0, address=self.address), 60)
+
+            return error, replies, status, Y
+
+        error, replies, status, Y = self.with_service(client)
+        self.assertEqual(error['type'], 'error')
+        self.assertEqual([reply['type'] for reply in replies], ['error'] * 7)
+        self.assertEqual(Y.shape, (1, 1, len(sweep.outputs)))
+        self.assertEqual(status['workers'], 1)
+        self.assertEqual(status['jobs'], [])
+
+    def test_broken_pool(self):
+        async def client():
+            # Worker dies during a run, the job fails
+            with mock.patch.object(service, 'run_task', exit_worker):
+                with self.assertRaises(RuntimeError):
+                    await asyncio.wait_for(service.request(['bias'], [[1]], t=2, n=5, address=self.address), 60)
+
+            # Later jobs run on a new pool of workers
+            return await asyncio.wait_for(service.request(['bias'], [[1]], t=2, n=5, seed=0, address=self.address), 60)
+
+        Y = self.with_service(client)
+        self.assertEqual(Y.shape, (1, 1, len(sweep.outputs)))
+
+if __name__ == '__main__':
+    unittest.main()
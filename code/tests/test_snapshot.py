@@ -0,0 +1,105 @@
+"""Test file for the snapshots of a run."""
+
+# Imports
+import numpy as np
+import os
+import tempfile
+import unittest
+from unittest import mock
+import events
+import model
+import snapshot
+
+class test_snapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, 'run.snap')
+        self.network = model.network(10, 'tags.txt')
+        np.random.seed(0)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_run(self):
+        writer = snapshot.writer(self.filename, every=3)
+        self.network.run(7, observers=[writer])
+
+        # Snapshots every 3 timesteps and of the final state
+        snapshots = snapshot.reader(self.filename)
+        self.assertEqual(list(snapshots.steps), [3, 6, 7])
+        self.assertEqual(list(snapshots.index['n_users']), [30, 60, 70])
+        self.assertEqual(writer.n_snapshots, 3)
+
+        users = snapshots.get(7)
+        agents = self.network.agents
+        for name in snapshot.snapshot_dtype.names:
+            self.assertTrue(np.array_equal(users[name], getattr(agents, name)[:agents.size]))
+        self.assertEqual(int(np.sum(users['reputation'])), self.network.reputation_total)
+
+        # Earlier snapshot contains the users at that time
+        self.assertTrue(np.array_equal(snapshots[0]['id'], np.arange(30)))
+        with self.assertRaises(KeyError):
+            snapshots.get(5)
+
+    def test_append(self):
+        self.network.run(2, observers=[snapshot.writer(self.filename, every=1)])
+        self.network.reset()
+        self.network.run(1, observers=[snapshot.writer(self.filename, every=1, append=True)])
+
+        snapshots = snapshot.reader(self.filename)
+        self.assertEqual(list(snapshots.steps), [1, 2, 1])
+        self.assertEqual(len(snapshots.get(1)), 10)
+
+    def test_crash(self):
+        self.network.run(2, observers=[snapshot.writer(self.filename, every=1)])
+
+        # Data of a snapshot that was not finished (no complete index entry) is ignored
+        with open(self.filename, 'ab') as f:
+            f.write(b'\x00' * 100)
+        with open(self.filename + '.idx', 'ab') as f:
+            f.write(b'\x00' * 5)
+
+        snapshots = snapshot.reader(self.filename)
+        self.assertEqual(len(snapshots), 2)
+        self.assertEqual(len(snapshots[1]), 20)
+
+        # Appending after the crash removes the incomplete snapshot first
+        self.network.reset()
+        self.network.run(1, observers=[snapshot.writer(self.filename, every=1, append=True)])
+        snapshots = snapshot.reader(self.filename)
+        self.assertEqual(list(snapshots.steps), [1, 2, 1])
+        self.assertEqual(list(snapshots.index['offset']), [0, 10 * snapshot.snapshot_dtype.itemsize, 30 * snapshot.snapshot_dtype.itemsize])
+        self.assertTrue(np.array_equal(snapshots[2]['id'], np.arange(10)))
+        self.assertEqual(os.path.getsize(self.filename), 40 * snapshot.snapshot_dtype.itemsize)
+
+    def test_errors(self):
+        # Failed write is reported at the end of the run without blocking the simulation,
+        # the other observers are still stopped and the recorder is flushed
+        writer = snapshot.writer(self.filename, every=1)
+        other = mock.Mock()
+        events_file = os.path.join(self.directory.name, 'run.events')
+        self.network.recorder = events.recorder(events_file)
+        with mock.patch.object(snapshot, 'index_dtype', 'invalid'):
+            with self.assertRaises(TypeError):
+                self.network.run(4, observers=[writer, other])
+        other.stop.assert_called_once_with(self.network)
+        self.assertTrue(os.path.getsize(events_file) > 0)
+        self.network.recorder = None
+
+        # Error is not carried over to the next run of the same writer
+        self.network.reset()
+        self.network.run(2, observers=[writer])
+        self.assertEqual(list(snapshot.reader(self.filename).steps), [1, 2])
+
+        # Error of the simulation is not hidden by an error of the writer
+        writer = snapshot.writer(self.filename, every=1)
+        writer.filename = self.directory.name
+        self.network.reset()
+        with mock.patch.object(self.network, 'create_user', side_effect=ValueError('simulation')):
+            with self.assertRaises(ValueError):
+                self.network.run(3, observers=[writer])
+        self.assertTrue(isinstance(writer.error, OSError))
+
+if __name__ == '__main__':
+    unittest.main()
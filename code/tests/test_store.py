@@ -0,0 +1,59 @@
+"""Test file for the columnar storage of the results of the sensitivity analysis."""
+
+# Imports
+import numpy as np
+import os
+import pandas as pd
+import tempfile
+import unittest
+import store
+
+class test_store(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.data = [{'n_questions': [1, 2, 3], 'coeff_upvotes': [-1.5, -1.6, -1.7]},
+                     {'n_questions': [4, 5], 'coeff_upvotes': [-2.0, -2.1]}]
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_ofat(self):
+        columns = store.ofat_records('bias', [1, 10], self.data)
+        self.assertEqual(list(columns['variable']), ['bias'] * 5)
+        self.assertEqual(list(columns['replicate']), [0, 1, 2, 0, 1])
+
+        filename = os.path.join(self.dir.name, 'ofat_bias.npz')
+        store.save_results(filename, columns)
+        merged = os.path.join(self.dir.name, 'ofat.npz')
+        store.merge_results([filename, filename], merged)
+        results = store.load_results(merged)
+        self.assertEqual(len(results), 10)
+
+        values, outcomes = store.ofat_matrix(store.load_results(filename), 'bias', 'n_questions')
+        self.assertEqual(list(values), [1, 10])
+        self.assertTrue(np.array_equal(outcomes, [[1, 2, 3], [4, 5, np.nan]], equal_nan=True))
+
+    def test_convert(self):
+        # Csv files with the replicates as strings (format of the local sensitivity analysis)
+        files = {}
+        for output in ['n_questions', 'coeff_upvotes']:
+            files[output] = os.path.join(self.dir.name, '%s.csv'%output)
+            pd.DataFrame({'bias': [str(d[output]) for d in self.data]}).to_csv(files[output])
+
+        columns = store.convert_ofat(files, {'bias': [1, 10]})
+        expected = store.ofat_records('bias', [1, 10], self.data)
+        for name in expected:
+            self.assertTrue(np.array_equal(columns[name], expected[name]))
+
+        # Csv files of the global sensitivity analysis, stored in the order of the design
+        gsa_files = []
+        for replicate in range(2):
+            gsa_files.append(os.path.join(self.dir.name, 'gsa_%s.csv'%replicate))
+            pd.DataFrame({'bias': [1.5, 2.5], 'n_answers': [10 * replicate, 10 * replicate + 1]}).to_csv(gsa_files[-1])
+
+        results = pd.DataFrame(store.convert_gsa(gsa_files)).iloc[::-1]
+        self.assertEqual(list(store.sobol_outputs(results, 'n_answers')), [0, 1, 10, 11])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+"""Test file for the sensitivity analysis on a surrogate model."""
+
+# Imports
+import numpy as np
+import unittest
+import surrogate
+
+class test_surrogate(unittest.TestCase):
+
+    def setUp(self):
+        self.problem = {'num_vars': 3, 'names': ['x1', 'x2', 'x3'], 'bounds': [[0, 1], [0, 2], [-1, 1]]}
+
+    def test_design(self):
+        X = surrogate.design(self.problem, 50, seed=0)
+        self.assertEqual(X.shape, (50, 3))
+        # Every interval of the latin hypercube contains one point
+        for i, (lower, upper) in enumerate(self.problem['bounds']):
+            intervals = np.floor((X[:, i] - lower) / (upper - lower) * 50)
+            self.assertEqual(len(np.unique(intervals)), 50)
+
+    def test_sobol_indices(self):
+        # Additive function with known indices: var(4 x1) = 16/12, var(x2) = 4/12, x3 has no influence
+        X = surrogate.design(self.problem, 80, seed=1)
+        Y = np.stack((4 * X[:, 0] + X[:, 1], X[:, 0] * 0 + 1 + X[:, 1]**2), axis=1)
+
+        gp = surrogate.emulator(self.problem)
+        gp.fit(X, Y)
+        self.assertTrue(np.allclose(gp.predict(X[:5]), Y[:5], atol=1e-2))
+
+        Si = surrogate.sobol_indices(gp, n=512, names=['linear', 'square'])
+        self.assertTrue(np.allclose(Si['linear']['S1'], [0.8, 0.2, 0], atol=0.05))
+        self.assertTrue(np.allclose(Si['linear']['ST'], [0.8, 0.2, 0], atol=0.05))
+        self.assertTrue(np.allclose(Si['square']['ST'], [0, 1, 0], atol=0.05))
+
+        errors = surrogate.validate({'linear': Si['linear']}, {'linear': Si['linear']})
+        self.assertEqual(errors.at['linear', 'S1'], 0)
+        self.assertTrue(errors.at['linear', 'covered'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+"""Test file for the helper functions used in the parameter sweeps."""
+
+# Imports
+import numpy as np
+import os
+import tempfile
+import unittest
+import cache
+import meanfield
+import model
+import sweep
+
+class test_sweep(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        self.network = model.network(20, 'tags.txt')
+
+    def test_set_parameter(self):
+        sweep.set_parameter(self.network, 'treshold', 30)
+        sweep.set_parameter(self.network, 'bias', 5)
+        sweep.set_parameter(self.network, 'mu_p_upvote', 0.1)
+        sweep.set_parameter(self.network, 'std_p_active', 0.2)
+
+        self.assertEqual(self.network.upvote_treshold, 30)
+        self.assertEqual(self.network.upvote_bias, 5)
+        self.assertEqual(self.network.distr[2][0], 0.1)
+        self.assertEqual(self.network.distr[3][1], 0.2)
+
+        # Default distribution of a new network is unchanged
+        self.assertEqual(model.network(20, 'tags.txt').distr[2][0], 0.5)
+
+        with self.assertRaises(ValueError):
+            sweep.set_parameter(self.network, 'mu_p_unknown', 0.1)
+
+    def test_ci_width(self):
+        self.assertEqual(sweep.ci_width([1]), np.inf)
+        self.assertEqual(sweep.ci_width([2, 2, 2]), 0)
+        self.assertTrue(sweep.ci_width([1, 2, 3], 0.99) > sweep.ci_width([1, 2, 3], 0.9))
+
+    def test_run_design(self):
+        # Unseeded replicates of the same sample point differ, also between forked workers
+        Y = sweep.run_design({'names': ['mu_p_ask']}, np.full((4, 1), 0.3), t=5, n=20, processes=2)
+        self.assertEqual(len(set(map(tuple, Y))), 4)
+
+    def test_run_adaptive(self):
+        # Very wide interval -> minimum number of runs
+        data, runs = sweep.run_adaptive(self.network, 3, min_runs=2, max_runs=4, rel_width=1e6)
+        self.assertEqual(runs, 2)
+        self.assertEqual(len(data['n_questions']), 2)
+
+        # Impossible interval -> maximum number of runs
+        data, runs = sweep.run_adaptive(self.network, 3, min_runs=2, max_runs=4, rel_width=0)
+        self.assertEqual(runs, 4)
+        for output in sweep.outputs:
+            self.assertEqual(len(data[output]), 4)
+
+    def test_early_stopping(self):
+        # Loose tolerance -> the run stops at the first comparison of two evaluations (timestep 15)
+        full = sweep.simulate(self.network, 20, seed=1)
+        stopped = sweep.simulate(self.network, 20, seed=1, tol=10, window=1)
+        self.assertNotEqual(stopped, full)
+        self.assertEqual(stopped, sweep.simulate(self.network, 15, seed=1))
+
+        # Same for the other sweep functions
+        self.assertEqual(sweep.run_replicates(self.network, 20, 1, seed=1, tol=10, window=1)['n_questions'],
+                         [stopped['n_questions']])
+        self.assertEqual(sweep.evaluate([], [], t=20, n=20, seed=1, tol=10, window=1),
+                         [stopped[output] for output in sweep.outputs])
+
+        # Runs that can stop early have their own cache key
+        self.assertNotEqual(cache.run_key(self.network, 20, 1, tol=10), cache.run_key(self.network, 20, 1))
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            run_cache = cache.run_cache(directory)
+
+            # Seeded run is stored and found again
+            output = sweep.simulate(self.network, 3, seed=1, cache=run_cache)
+            self.assertEqual((run_cache.hits, run_cache.misses), (0, 1))
+            self.assertEqual(sweep.simulate(self.network, 3, seed=1, cache=run_cache), output)
+            self.assertEqual((run_cache.hits, run_cache.misses), (1, 1))
+
+            # Same result without the cache
+            self.assertEqual(sweep.simulate(self.network, 3, seed=1), output)
+
+            # Different seed or setting gives a different key
+            key = cache.run_key(self.network, 3, 1)
+            self.assertNotEqual(cache.run_key(self.network, 3, 2), key)
+            self.assertEqual(cache.run_key(model.network(20, 'tags.txt', bias=12.0), 3, 1), key)
+            sweep.set_parameter(self.network, 'mu_p_ask', 0.4)
+            self.assertNotEqual(cache.run_key(self.network, 3, 1), key)
+
+            # Overwriting an entry does not count its size twice
+            size = run_cache.size
+            run_cache.put(key, output)
+            self.assertEqual(run_cache.size, size)
+
+            # Least recently used entries are removed
+            run_cache.max_size = 2 * run_cache.size
+            for seed in range(2, 6):
+                sweep.simulate(self.network, 1, seed=seed, cache=run_cache)
+            self.assertTrue(run_cache.size <= run_cache.max_size)
+            self.assertEqual(len(os.listdir(directory)), 2)
+
+            # Mean-field approximation with the same setting has its own entries
+            approximation = meanfield.meanfield(20, 'tags.txt')
+            sweep.set_parameter(approximation, 'mu_p_ask', 0.4)
+            self.assertNotEqual(cache.run_key(approximation, 3, 1), cache.run_key(self.network, 3, 1))
+            self.assertNotEqual(sweep.simulate(approximation, 1, seed=5, cache=run_cache),
+                                sweep.simulate(self.network, 1, seed=5, cache=run_cache))
+
+if __name__ == '__main__':
+    unittest.main()
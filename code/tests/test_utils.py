@@ -0,0 +1,36 @@
+"""Test file for the helper functions of the model."""
+
+# Imports
+import numpy as np
+import unittest
+import user
+import utils
+
+class test_utils(unittest.TestCase):
+
+    def setUp(self):
+        # Answers with a random number of upvotes
+        np.random.seed(0)
+        self.answers = []
+        for i in range(200):
+            a = user.answer(i, 0)
+            a.upvotes = list(range(np.random.randint(0, 8)))
+            self.answers.append(a)
+
+    def test_sort_by_upvotes(self):
+        # Counting sort and builtin sort give the same (stable) order
+        expected = sorted(self.answers, key=lambda x: len(x.upvotes), reverse=True)
+        self.assertEqual(utils.sort_by_upvotes(self.answers), expected)
+        self.assertEqual(utils.sort_by_upvotes(self.answers, min_length=1000), expected)
+        self.assertEqual(utils.sort_by_upvotes([]), [])
+
+    def test_promote(self):
+        answers = utils.sort_by_upvotes(self.answers)
+        for ind in [199, 100, 0, 57]:
+            a = answers[ind]
+            a.upvotes.append(-1)
+            utils.promote(answers, a)
+            self.assertEqual(answers, utils.sort_by_upvotes(answers))
+
+if __name__ == '__main__':
+    unittest.main()
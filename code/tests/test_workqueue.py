@@ -0,0 +1,118 @@
+"""Test file for the shared-filesystem work queue."""
+
+# Imports
+import multiprocessing as mp
+import numpy as np
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+import sweep
+import workqueue
+
+class test_workqueue(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.queue = os.path.join(self.directory.name, 'queue')
+        self.names = ['mu_p_ask', 'bias']
+        self.settings = [[0.3, 2], [0.6, 4], [0.5, 1]]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_workers(self):
+        self.assertEqual(workqueue.create(self.queue, self.names, self.settings, runs=2, t=2, n=5, seed=0), 6)
+
+        # Incomplete design is not merged
+        with self.assertRaises(RuntimeError):
+            workqueue.merge(self.queue)
+
+        # Several workers (processes) share the queue
+        workers = [mp.Process(target=workqueue.work, args=(self.queue,), kwargs={'poll': 0.1}) for _ in range(3)]
+        for p in workers:
+            p.start()
+        for p in workers:
+            p.join()
+
+        self.assertEqual(workqueue.count(self.queue), {'todo': 0, 'running': 0, 'failed': 0, 'results': 6})
+
+        columns = workqueue.merge(self.queue, os.path.join(self.directory.name, 'results.npz'))
+        self.assertEqual(list(columns['replicate']), [0, 0, 0, 1, 1, 1])
+        self.assertEqual(list(columns['sample']), [0, 1, 2, 0, 1, 2])
+        self.assertEqual(list(columns['bias']), [2, 4, 1, 2, 4, 1])
+
+        # Same outcome as running the tasks directly (replicate r uses seed + r)
+        for row in range(6):
+            y = sweep.evaluate(self.settings[columns['sample'][row]], self.names, t=2, n=5, seed=columns['replicate'][row])
+            self.assertTrue(np.allclose([columns[output][row] for output in sweep.outputs], y))
+
+    def test_abandoned(self):
+        workqueue.create(self.queue, self.names, self.settings[:2], t=2, n=5, seed=0)
+
+        # Worker claims a task and stops sending heartbeats
+        path, task = workqueue.claim(self.queue)
+        self.assertEqual(task['attempts'], 1)
+        self.assertEqual(workqueue.count(self.queue)['running'], 1)
+        self.assertEqual(workqueue.requeue(self.queue, lease=60), 0)
+
+        past = time.time() - 120
+        os.utime(path, (past, past))
+        self.assertEqual(workqueue.work(self.queue, lease=60), 2)
+        self.assertEqual(workqueue.count(self.queue)['results'], 2)
+
+    def test_expired_claim(self):
+        workqueue.create(self.queue, self.names, self.settings[:1], t=2, n=5, seed=0)
+
+        # Lease of a slow worker expires and another worker claims the task again
+        slow_path, slow_task = workqueue.claim(self.queue)
+        past = time.time() - 120
+        os.utime(slow_path, (past, past))
+        self.assertEqual(workqueue.requeue(self.queue, lease=60), 1)
+        path, task = workqueue.claim(self.queue)
+        self.assertNotEqual(path, slow_path)
+
+        # The slow worker finishes (a failure) without touching the claim of the other worker
+        slow_task['error'] = 'slow'
+        self.assertFalse(workqueue.finish(self.queue, slow_path, slow_task, None, max_attempts=1))
+        self.assertEqual(workqueue.count(self.queue), {'todo': 0, 'running': 1, 'failed': 0, 'results': 0})
+        self.assertEqual(workqueue.read_json(path)['attempts'], 2)
+
+        self.assertTrue(workqueue.finish(self.queue, path, task, [1.0] * len(sweep.outputs)))
+        self.assertEqual(workqueue.count(self.queue), {'todo': 0, 'running': 0, 'failed': 0, 'results': 1})
+
+    def test_clock(self):
+        workqueue.create(self.queue, self.names, self.settings[:1], t=2, n=5, seed=0)
+        workqueue.claim(self.queue)
+
+        # Leases are determined with the clock of the filesystem, not with the clock of the machine
+        with mock.patch('time.time', return_value=time.time() + 3600):
+            self.assertEqual(workqueue.requeue(self.queue, lease=60), 0)
+
+    def test_failed(self):
+        workqueue.create(self.queue, ['unknown'], [[1]], t=2, n=5)
+
+        # Task is retried until the maximum number of attempts
+        self.assertEqual(workqueue.work(self.queue, max_attempts=2), 2)
+        self.assertEqual(workqueue.count(self.queue), {'todo': 0, 'running': 0, 'failed': 1, 'results': 0})
+
+        failed = workqueue.read_json(os.path.join(self.queue, 'failed', '000000_0000.json'))
+        self.assertEqual(failed['attempts'], 2)
+        self.assertTrue('unknown' in failed['error'])
+
+        # Results of a queue with failed tasks are not merged
+        with self.assertRaises(RuntimeError):
+            workqueue.merge(self.queue, os.path.join(self.directory.name, 'results.npz'))
+        self.assertFalse(os.path.exists(os.path.join(self.directory.name, 'results.npz')))
+
+    def test_seed(self):
+        # Without a seed, a random seed is drawn once and stored in every task
+        workqueue.create(self.queue, self.names, self.settings[:1], runs=2, t=2, n=5)
+        first = workqueue.read_json(os.path.join(self.queue, 'todo', '000000_0000.json'))
+        second = workqueue.read_json(os.path.join(self.queue, 'todo', '000000_0001.json'))
+        self.assertTrue(isinstance(first['seed'], int))
+        self.assertEqual(second['seed'], first['seed'] + 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,6 +3,12 @@
 # Imports
 import numpy as np
 
+import population
+import utils
+
+# Probabilities are kept away from 0 and 1 (finite logit)
+probability = (population.p_min, population.p_max)
+
 
 class user:
     """
@@ -27,9 +33,9 @@ class user:
     p_active : float
         probability of being active on the site
     vis_questions : list
-        all the questions that can be seen by this user
+        all the questions that can be seen by this user (an empty tuple if there are none)
     my_questions : list
-        all the questions asked by this user
+        all the questions asked by this user (an empty tuple if there are none)
     upvote_bias : int
         number of upvotes the user is satisfied with
     n_questions_asked : int
@@ -48,10 +54,14 @@ class user:
         begin probability of upvoting
     p_active_begin : float
         begin probability of being active
+    agents : .population.population
+        arrays in which the attributes of the user are stored
+    slot : int
+        index of the user in the arrays of the population
 
     Methods
     -------
-    ask_question()
+    ask_question(u)
         Generate a question.
     answer_question(q)
         Generate an answer.
@@ -59,12 +69,36 @@ class user:
         Check if question/answer is upvoted by the user.
     update_p(p, n_upvotes, bias)
         Update probability based on the number of upvotes received.
+    feedback(param, n_upvotes)
+        Update one of the probabilities of the user based on the number of upvotes received.
     eval()
         Evaluate a user's questions and corresponding answers.
-    step()
+    step(u_ask)
         Timestep of a single user.
     """
 
+    # The attributes are stored in the population of the model (see population.fields), the object is a view
+    __slots__ = ('system', 'agents', 'slot', 'vis_questions', 'my_questions')
+
+    id = population.field('id', int)
+    reputation = population.field('reputation', int)
+    upvote_bias = population.field('upvote_bias', int)
+
+    p_ask = population.field('p_ask', float, probability)
+    p_answer = population.field('p_answer', float, probability)
+    p_interact = population.field('p_interact', float, probability)
+    p_active = population.field('p_active', float, probability)
+
+    p_ask_begin = population.field('p_ask_begin', float, probability)
+    p_answer_begin = population.field('p_answer_begin', float, probability)
+    p_interact_begin = population.field('p_interact_begin', float, probability)
+    p_active_begin = population.field('p_active_begin', float, probability)
+
+    n_questions_asked = population.field('n_questions_asked', int)
+    n_questions_answered = population.field('n_questions_answered', int)
+    n_questions_upvoted = population.field('n_questions_upvoted', int)
+    n_answers_upvoted = population.field('n_answers_upvoted', int)
+
     def __init__(self, system, i, tag):
         """
         Initialize a Stack overflow user.
@@ -81,6 +115,10 @@ class user:
         # Model
         self.system = system
 
+        # Slot in the population of the model (all attributes start at zero)
+        self.agents = system.agents
+        self.slot = self.agents.allocate()
+
         # ID
         self.id = i
         self.tag = tag
@@ -88,45 +126,60 @@ class user:
         # Starting reputation
         self.reputation = 1
 
-        # Probabilities to ask, answer, upvote, be active
-        self.p_ask = 0
-        self.p_answer = 0
-        self.p_interact = 0
-        self.p_active = 0
-
-        # Visible questions/answeres (from people with the same tag)
-        self.vis_questions = []
-        self.my_questions = []
+        # Visible questions/answeres (from people with the same tag),
+        # most users have none so the lists are only created when needed
+        self.vis_questions = ()
+        self.my_questions = ()
 
         # Number of upvotes the user is satisfied with
         self.upvote_bias = system.upvote_bias
 
-        # Data storage
-        self.n_questions_asked = 0
-        self.n_questions_answered = 0
+    @property
+    def tag(self):
+        """Tag of the user."""
+        return self.agents.tag.item(self.slot)
 
-        self.n_questions_upvoted = 0
-        self.n_answers_upvoted = 0
+    @tag.setter
+    def tag(self, tag):
+        # The population keeps an index of the members of every tag
+        self.agents.set_tag(self.slot, tag)
 
-        self.p_ask_begin = 0
-        self.p_answer_begin = 0
-        self.p_interact_begin = 0
-        self.p_active_begin = 0
+    def ask_question(self, u=None):
+        """
+        Generate a question.
 
-    def ask_question(self):
-        """Generate a question."""
-        u = np.random.uniform()
+        Parameters
+        ----------
+        u : float
+            uniform random number that decides if a question is asked, drawn if not given
+        """
+        if u is None:
+            u = np.random.uniform()
         if u < self.p_ask:
             q = question(self.id, self.tag)
-            self.my_questions.append(q)
+            if self.my_questions:
+                self.my_questions.append(q)
+            else:
+                self.my_questions = [q]
             self.system.questions.append(q)
-
-            # Make the question visible for all active people with the same tag
-            for id in self.system.tags[self.tag]:
-                if id != q.asker:
-                    u = np.random.uniform()
-                    if u < self.system.users[id].p_active:
-                        self.system.users[id].vis_questions.append(q)
+            self.system.n_questions += 1
+            self.system.pending.add(self.id)
+
+            if self.system.recorder is not None:
+                self.system.recorder.record(self.system.time, 'ask', self.id, len(self.system.questions) - 1, self.tag, 0)
+
+            # Make the question visible for all active people with the same tag (one draw per member of
+            # the tag against the arrays of the population, only the users that see the question are visited)
+            slots = self.agents.with_tag(q.tag)
+            slots = slots[self.agents.id[slots] != q.asker]
+            u = np.random.uniform(size=len(slots))
+            for id in self.agents.id[slots[u < self.agents.p_active[slots]]].tolist():
+                user = self.system.users[id]
+                if user.vis_questions:
+                    user.vis_questions.append(q)
+                else:
+                    user.vis_questions = [q]
+                self.system.notify(id)
             self.n_questions_asked += 1
 
     def answer_question(self, q):
@@ -145,19 +198,25 @@ class user:
             0 otherwise
         """
         outcome = 0
-        u = np.random.uniform()
+        # Same number as np.random.uniform(), without its argument handling (this is called very often)
+        u = np.random.random_sample()
 
         # Lower probability if the question is already answered
-        x = np.log(self.p_answer/(1-self.p_answer))
+        p_answer = self.agents.p_answer.item(self.slot)
+        x = np.log(p_answer/(1-p_answer))
         x -= len(q.answers)
         p_answer = 1 / (1 + np.exp(-x))
 
         if u < p_answer:
             a = answer(self.id, q.tag)
             q.answers.append(a)
-            self.n_questions_answered += 1
+            self.agents.n_questions_answered[self.slot] += 1
+            self.system.n_answers += 1
             outcome = 1
 
+            if self.system.recorder is not None:
+                self.system.recorder.record(self.system.time, 'answer', self.id, q.asker, q.tag, len(q.answers))
+
         return outcome
 
     def upvote(self, interaction, upvotes):
@@ -176,28 +235,40 @@ class user:
         upvotes : int
             updated number of upvotes
         """
+        # Called for every visible question and answer, the attributes are read from the arrays directly
+        agents = self.agents
+        slot = self.slot
+
         # Check if the reputation is high enough to upvote
-        if self.reputation >= self.system.upvote_treshold:
-            u = np.random.uniform()
+        if agents.reputation.item(slot) >= self.system.upvote_treshold:
+            u = np.random.random_sample()
 
             # Lower probability if the user has already upvoted question/answers
-            x = np.log(self.p_interact/(1-self.p_interact))
+            p_interact = agents.p_interact.item(slot)
+            x = np.log(p_interact/(1-p_interact))
             x -= upvotes
             p_upvote = 1 / (1 + np.exp(-x))
 
             # Upvote question/answer
             if u < p_upvote:
-                interaction.upvotes.append(self.id)
+                interaction.upvotes.append(agents.id.item(slot))
                 upvotes += 1
                 if type(interaction) == question:
-                    self.n_questions_upvoted += 1
+                    agents.n_questions_upvoted[slot] += 1
                     id = interaction.asker
+                    kind = 'upvote_question'
                 else:
-                    self.n_answers_upvoted += 1
+                    agents.n_answers_upvoted[slot] += 1
                     id = interaction.responder
+                    kind = 'upvote_answer'
+                self.system.count_upvote(self)
+
+                if self.system.recorder is not None:
+                    self.system.recorder.record(self.system.time, kind, self.id, id, interaction.tag, 0)
 
                 # Increase the reputation
-                self.system.users[id].reputation += 10
+                receiver = self.system.users[id]
+                self.system.set_reputation(receiver, receiver.agents.reputation.item(receiver.slot) + 10)
 
         return upvotes
 
@@ -236,6 +307,29 @@ class user:
 
         return new_p
 
+    def feedback(self, param, n_upvotes):
+        """
+        Update one of the probabilities of the user based on the number of upvotes received.
+
+        Parameters
+        ----------
+        param : str
+            name of the probability ('p_ask', 'p_answer', 'p_interact' or 'p_active')
+        n_upvotes : int
+            number of upvotes
+        """
+        p = getattr(self, param)
+        setattr(self, param, self.update_p(p, n_upvotes, self.upvote_bias))
+        # Value after clipping and rounding to the precision of the population
+        new_p = getattr(self, param)
+
+        # Keep the summary statistics of the system up to date
+        ind = self.system.probabilities.index(param)
+        self.system.p_total[ind] += new_p - p
+
+        if self.system.recorder is not None:
+            self.system.recorder.record(self.system.time, 'probability', self.id, ind, self.tag, new_p)
+
     def eval(self):
         """Evaluate a user's questions and corresponding answers."""
         for q in self.my_questions[::-1]:
@@ -244,8 +338,8 @@ class user:
             # Give every user the chance to upvote all the answers
             if q.age == 2:
                 # Update probability of asking and being active
-                self.p_ask = self.update_p(self.p_ask, len(q.upvotes), self.upvote_bias)
-                self.p_active = self.update_p(self.p_active, len(q.upvotes), self.upvote_bias)
+                self.feedback('p_ask', len(q.upvotes))
+                self.feedback('p_active', len(q.upvotes))
 
                 if q.answers:
                     max = q.answers[0]
@@ -255,43 +349,62 @@ class user:
 
                         # Update probability of answering and being active
                         user = self.system.users[a.responder]
-                        user.p_answer = self.update_p(user.p_answer, len(a.upvotes), user.upvote_bias)
-                        user.p_active = self.update_p(user.p_active, len(a.upvotes), user.upvote_bias)
+                        user.feedback('p_answer', len(a.upvotes))
+                        user.feedback('p_active', len(a.upvotes))
 
                     # Increase the reputation of the user that gave the answer with the most upvotes
-                    self.system.users[max.responder].reputation += 15
+                    user = self.system.users[max.responder]
+                    self.system.set_reputation(user, user.reputation + 15)
 
                 else:
                     # If there was no answer on the question, decrease reputation of asker (downvote)
-                    self.reputation -= 2
-                    self.reputation = np.max((self.reputation, 1))
+                    self.system.set_reputation(self, np.max((self.reputation - 2, 1)))
 
                 self.my_questions.remove(q)
 
-    def step(self):
-        """Timestep of a single user."""
+        if not self.my_questions:
+            self.my_questions = ()
+            self.system.pending.discard(self.id)
+
+    def step(self, u_ask=None):
+        """
+        Timestep of a single user.
+
+        Parameters
+        ----------
+        u_ask : float
+            uniform random number that decides if a question is asked, drawn if not given
+        """
         # Evaluate previous questions
         self.eval()
 
         # Determine if user will ask a question
-        self.ask_question()
-
-        # Sort the visible questions based on upvotes
-        self.vis_questions.sort(key=lambda x: len(x.upvotes), reverse=True)
-        q_upvoted = 0
-        for q in self.vis_questions:
-            a_upvoted = 0
-            # Upvote question
-            q_upvoted = self.upvote(q, q_upvoted)
-            # Answer question
-            answered = self.answer_question(q)
-            if not answered:
-                q.answers.sort(key=lambda x: len(x.upvotes), reverse=True)
-                # Upvote answers
-                for a in q.answers:
-                    a_upvoted = self.upvote(a, a_upvoted)
+        self.ask_question(u_ask)
+
+        if self.agents.reputation.item(self.slot) < self.system.upvote_treshold:
+            # Without upvoting privilege the user can only answer the visible questions (order is irrelevant)
+            for q in self.vis_questions:
+                self.answer_question(q)
+        else:
+            # Sort the visible questions based on upvotes
+            self.vis_questions = utils.sort_by_upvotes(self.vis_questions)
+            q_upvoted = 0
+            for q in self.vis_questions:
+                a_upvoted = 0
+                # Upvote question
+                q_upvoted = self.upvote(q, q_upvoted)
+                # Answer question
+                answered = self.answer_question(q)
+                if not answered:
+                    # Upvote answers (the answers are kept sorted on upvotes, so no sorting is needed)
+                    for a in list(q.answers):
+                        upvoted = self.upvote(a, a_upvoted)
+                        if upvoted > a_upvoted:
+                            utils.promote(q.answers, a)
+                        a_upvoted = upvoted
         # Remove questions from the visible list
-        self.vis_questions = []
+        self.vis_questions = ()
+        self.system.visible.discard(self.id)
 
 
 class question:
@@ -309,9 +422,11 @@ class question:
     upvotes : list
         ids of the users that have upvoted the question
     answers : list
-        all the answers that were given on this question
+        all the answers that were given on this question (sorted on upvotes, most upvotes first)
     """
 
+    __slots__ = ('asker', 'tag', 'age', 'upvotes', 'answers')
+
     def __init__(self, id, tag):
         """
         Initialize a question.
@@ -345,6 +460,8 @@ class answer:
         ids of the users that have upvoted the answer
     """
 
+    __slots__ = ('responder', 'tag', 'upvotes')
+
     def __init__(self, id, tag):
         """
         Initialize an answer.
@@ -95,3 +95,60 @@ def calc_cdf(pdf):
         cdf.append(value)
 
     return np.array(cdf)
+
+def sort_by_upvotes(items, min_length=64):
+    """
+    Sort questions/answers on their number of upvotes (most upvotes first, ties keep their order).
+
+    Long lists are sorted with a counting sort (upvotes are small integers),
+    for short lists the builtin sort is faster.
+
+    Parameters
+    ----------
+    items : list
+        questions or answers
+    min_length : int
+        minimum length of the list to use the counting sort, default is 64
+
+    Returns
+    -------
+    sorted_items : list
+        sorted questions or answers
+    """
+    if len(items) < min_length:
+        return sorted(items, key=lambda x: len(x.upvotes), reverse=True)
+
+    counts = [len(x.upvotes) for x in items]
+    buckets = [[] for _ in range(max(counts) + 1)]
+    for item, count in zip(items, counts):
+        buckets[count].append(item)
+
+    sorted_items = []
+    for bucket in reversed(buckets):
+        sorted_items += bucket
+
+    return sorted_items
+
+def promote(items, item):
+    """
+    Restore the order of a list sorted on upvotes after one of the items gained an upvote.
+
+    The item moves in front of all items with less upvotes (behind the items with the same number),
+    which gives the same order as sorting the list again.
+
+    Parameters
+    ----------
+    items : list
+        questions or answers sorted on upvotes (most upvotes first)
+    item : .user.question or .user.answer
+        item that gained an upvote
+    """
+    i = items.index(item)
+    n_upvotes = len(item.upvotes)
+
+    j = i
+    while j > 0 and len(items[j - 1].upvotes) < n_upvotes:
+        j -= 1
+
+    if j < i:
+        items.insert(j, items.pop(i))
@@ -0,0 +1,434 @@
+"""Work queue on a shared filesystem to distribute the runs of a sweep over several machines."""
+
+# Imports
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+
+import numpy as np
+
+import sweep
+from store import save_results
+
+# Subdirectories of a queue (a task is a json file that moves between them)
+states = ['todo', 'running', 'failed', 'results']
+
+
+def write_json(path, data):
+    """
+    Write a json file atomically (other workers never see a partial file).
+
+    Parameters
+    ----------
+    path : str
+        name of the file
+    data : dict
+        content of the file
+    """
+    tmp = '%s.%s.%d.tmp' %(path, socket.gethostname(), os.getpid())
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def read_json(path):
+    """
+    Read a json file.
+
+    Parameters
+    ----------
+    path : str
+        name of the file
+
+    Returns
+    -------
+    data : dict
+        content of the file (None if the file does not exist, e.g. it was claimed by another worker)
+    """
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def task_name(name):
+    """
+    Name of the file of a task in the todo, failed and results directories.
+
+    Parameters
+    ----------
+    name : str
+        name of a file of the task (e.g. a claim in the running directory)
+
+    Returns
+    -------
+    name : str
+        name of the task (sample and replicate, e.g. 000003_0001.json)
+    """
+    return name.split('.', 1)[0] + '.json'
+
+
+def filesystem_time(directory):
+    """
+    Current time of the filesystem of the queue (the clocks of the machines can differ).
+
+    Parameters
+    ----------
+    directory : str
+        directory of the queue
+
+    Returns
+    -------
+    now : float
+        modification time of a file that is touched now
+    """
+    probe = os.path.join(directory, '.clock.%s.%d' %(socket.gethostname(), os.getpid()))
+    with open(probe, 'w'):
+        pass
+    now = os.path.getmtime(probe)
+    os.remove(probe)
+
+    return now
+
+
+def create(directory, names, settings, runs=1, t=20, n=150, seed=None):
+    """
+    Create a queue with one task per (sample point, replicate).
+
+    Parameters
+    ----------
+    directory : str
+        directory of the queue (on the shared filesystem)
+    names : list
+        names of the variables
+    settings : numpy.ndarray
+        sample points (value of every variable)
+    runs : int
+        number of replicates of every sample point, default is 1
+    t : int
+        number of timesteps, default is 20
+    n : int
+        number of users added every timestep, default is 150
+    seed : int
+        seed of the first replicate (replicate i uses seed + i), default is None (a random seed is drawn
+        and stored in the tasks, so a task that is executed twice still gives the same result)
+
+    Returns
+    -------
+    n_tasks : int
+        number of tasks
+    """
+    for state in states:
+        os.makedirs(os.path.join(directory, state), exist_ok=True)
+
+    if seed is None:
+        seed = int(np.random.SeedSequence().generate_state(1)[0] % 2**31)
+
+    settings = np.asarray(settings, dtype=float)
+    write_json(os.path.join(directory, 'queue.json'), {'n_samples': len(settings), 'runs': runs, 'seed': seed})
+    for r in range(runs):
+        for i, setting in enumerate(settings):
+            task = {'sample': i, 'replicate': r, 'names': list(names), 'setting': setting.tolist(),
+                    't': t, 'n': n, 'seed': seed + r, 'attempts': 0}
+            write_json(os.path.join(directory, 'todo', '%06d_%04d.json' %(i, r)), task)
+
+    return len(settings) * runs
+
+
+def count(directory):
+    """
+    Number of tasks in every state.
+
+    Parameters
+    ----------
+    directory : str
+        directory of the queue
+
+    Returns
+    -------
+    counts : dict
+        number of tasks that are todo, running, failed and finished (results)
+    """
+    # Temporary files of write_json are not counted
+    return {state: len([f for f in os.listdir(os.path.join(directory, state)) if not f.endswith('.tmp')])
+            for state in states}
+
+
+def requeue(directory, lease):
+    """
+    Put the tasks of which the lease expired (the worker stopped sending heartbeats) back in the queue.
+
+    The age of a claim is determined with the clock of the filesystem (see filesystem_time), which also
+    sets the modification times of the heartbeats, so the clocks of the machines do not have to agree.
+
+    Parameters
+    ----------
+    directory : str
+        directory of the queue
+    lease : float
+        number of seconds after the last heartbeat that a task is considered abandoned
+
+    Returns
+    -------
+    n_requeued : int
+        number of tasks that were put back
+    """
+    n_requeued = 0
+    now = filesystem_time(directory)
+    running = os.path.join(directory, 'running')
+    for name in os.listdir(running):
+        path = os.path.join(running, name)
+        try:
+            if not name.endswith('.tmp') and now - os.path.getmtime(path) > lease:
+                # Renaming is atomic, only one worker puts the task back
+                os.rename(path, os.path.join(directory, 'todo', task_name(name)))
+                n_requeued += 1
+        except FileNotFoundError:
+            pass
+
+    return n_requeued
+
+
+def claim(directory):
+    """
+    Claim the next task of the queue.
+
+    Parameters
+    ----------
+    directory : str
+        directory of the queue
+
+    Returns
+    -------
+    path : str
+        file of the claim in the running directory, unique for every claim (None if the queue is empty)
+    task : dict
+        claimed task (None if the queue is empty)
+    """
+    todo = os.path.join(directory, 'todo')
+    for name in sorted(os.listdir(todo)):
+        if not name.endswith('.json'):
+            continue
+
+        # A task that is claimed again (after its lease expired) gets another file, so the previous
+        # worker can not finish the claim of the new one
+        claim_name = '%s.%s.%d.%s.json' %(name[:-len('.json')], socket.gethostname(), os.getpid(), uuid.uuid4().hex)
+        path = os.path.join(directory, 'running', claim_name)
+        try:
+            # The worker that renames the file owns the task (the others get an error)
+            os.rename(os.path.join(todo, name), path)
+            # Start of the lease (renaming keeps the old modification time)
+            os.utime(path)
+        except FileNotFoundError:
+            continue
+
+        task = read_json(path)
+        if task is None:
+            # Requeued again in the meantime
+            continue
+        task['attempts'] += 1
+        task['worker'] = '%s:%d' %(socket.gethostname(), os.getpid())
+        write_json(path, task)
+
+        return path, task
+
+    return None, None
+
+
+class heartbeat(threading.Thread):
+    """
+    Thread that renews the lease of a claimed task by touching its file.
+
+    Attributes
+    ----------
+    path : str
+        file of the claimed task
+    interval : float
+        number of seconds between two heartbeats
+    stopped : threading.Event
+        set when the task is finished
+    """
+
+    def __init__(self, path, interval):
+        """
+        Initialize a heartbeat.
+
+        Parameters
+        ----------
+        path : str
+            file of the claimed task
+        interval : float
+            number of seconds between two heartbeats
+        """
+        super().__init__(daemon=True)
+        self.path = path
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        """Touch the file of the task until it is finished."""
+        while not self.stopped.wait(self.interval):
+            try:
+                os.utime(self.path)
+            except FileNotFoundError:
+                # Task was requeued by another worker
+                return
+
+
+def finish(directory, path, task, y, max_attempts=3):
+    """
+    Finish a claimed task: store the result or put the task back (in todo, or in failed after max_attempts).
+
+    Parameters
+    ----------
+    directory : str
+        directory of the queue
+    path : str
+        file of the claim (see claim)
+    task : dict
+        claimed task (with the error if it failed)
+    y : list
+        value of every output parameter (None if the task failed)
+    max_attempts : int
+        number of times a task is tried before it is moved to the failed directory, default is 3
+
+    Returns
+    -------
+    owned : bool
+        False if the lease expired and the task was put back by another worker (nothing is changed,
+        the other attempt gives the same result)
+    """
+    # The claim is renamed first, this fails if it was requeued, so the task of another worker is never
+    # changed (a file that is not a claim is still requeued if the worker stops here)
+    finishing = path + '.finishing'
+    try:
+        os.rename(path, finishing)
+    except FileNotFoundError:
+        return False
+
+    name = task_name(os.path.basename(path))
+    if y is not None:
+        task['outputs'] = dict(zip(sweep.outputs, [float(value) for value in y]))
+        write_json(os.path.join(directory, 'results', name), task)
+        os.remove(finishing)
+    else:
+        write_json(finishing, task)
+        state = 'failed' if task['attempts'] >= max_attempts else 'todo'
+        os.rename(finishing, os.path.join(directory, state, name))
+
+    return True
+
+
+def work(directory, lease=300, max_attempts=3, poll=5, max_tasks=None):
+    """
+    Execute tasks of the queue until all tasks are finished (run this on every machine).
+
+    Every task has a seed (see create), so a task that is executed twice (a slow worker of which
+    the lease expired) gives the same result shard.
+
+    Parameters
+    ----------
+    directory : str
+        directory of the queue (on the shared filesystem)
+    lease : float
+        number of seconds without heartbeat after which a task is given to another worker, default is 300
+    max_attempts : int
+        number of times a task is tried before it is moved to the failed directory, default is 3
+    poll : float
+        number of seconds between two checks for abandoned tasks when the queue is empty, default is 5
+    max_tasks : int
+        stop after this number of tasks, default is None (no limit)
+
+    Returns
+    -------
+    n_tasks : int
+        number of tasks that were executed by this worker
+    """
+    n_tasks = 0
+    while max_tasks is None or n_tasks < max_tasks:
+        requeue(directory, lease)
+        path, task = claim(directory)
+        if path is None:
+            if count(directory)['running'] == 0:
+                break
+            # Other workers are busy, wait for their results or for abandoned tasks
+            time.sleep(poll)
+            continue
+
+        beat = heartbeat(path, lease / 4)
+        beat.start()
+        try:
+            y = sweep.evaluate(task['setting'], task['names'], task['t'], task['n'], seed=task['seed'])
+        except Exception as error:
+            task['error'] = repr(error)
+            y = None
+        finally:
+            beat.stopped.set()
+            beat.join()
+
+        finish(directory, path, task, y, max_attempts)
+        n_tasks += 1
+
+    return n_tasks
+
+
+def merge(directory, filename=None):
+    """
+    Merge the result shards of all finished tasks.
+
+    Parameters
+    ----------
+    directory : str
+        directory of the queue
+    filename : str
+        name of the .npz file to which the results are written, default is None (not written)
+
+    Returns
+    -------
+    columns : dict
+        columns replicate, sample, one column per variable and one per output (one row per run,
+        sorted on replicate and sample)
+
+    Raises
+    ------
+    RuntimeError
+        if tasks failed or not every (sample point, replicate) has a result (the design would be incomplete)
+    """
+    counts = count(directory)
+    if counts['failed'] > 0:
+        raise RuntimeError('%d tasks failed (see %s)' %(counts['failed'], os.path.join(directory, 'failed')))
+
+    results = os.path.join(directory, 'results')
+    tasks = [read_json(os.path.join(results, name)) for name in os.listdir(results) if name.endswith('.json')]
+    tasks.sort(key=lambda task: (task['replicate'], task['sample']))
+
+    queue = read_json(os.path.join(directory, 'queue.json'))
+    expected = [(r, i) for r in range(queue['runs']) for i in range(queue['n_samples'])]
+    if [(task['replicate'], task['sample']) for task in tasks] != expected:
+        raise RuntimeError('Results of %d of the %d tasks are missing' %(len(expected) - len(tasks), len(expected)))
+
+    columns = {'replicate': np.array([task['replicate'] for task in tasks], dtype=int),
+               'sample': np.array([task['sample'] for task in tasks], dtype=int)}
+    if tasks:
+        for i, name in enumerate(tasks[0]['names']):
+            columns[name] = np.array([task['setting'][i] for task in tasks])
+    for output in sweep.outputs:
+        columns[output] = np.array([task['outputs'][output] for task in tasks])
+
+    if filename is not None:
+        save_results(filename, columns)
+
+    return columns
+
+
+if __name__ == '__main__':
+    # Start a worker on this machine: python workqueue.py <directory of the queue>
+    directory = sys.argv[1] if len(sys.argv) > 1 else 'work_queue'
+
+    n_tasks = work(directory)
+    print(socket.gethostname(), n_tasks, count(directory))